@@ -1,218 +1,164 @@
 # app.py
 import streamlit as st
-import pdfplumber
-import os
-import sqlite3
 import json
-from h5p_builder import create_h5p_course_presentation
-
-# Import API clients
-from groq import Groq
-from openai import OpenAI
-import anthropic
-from google.generativeai import configure as google_configure, GenerativeModel
-
-# DB Functions
-def init_db():
-    conn = sqlite3.connect("prompt_frameworks.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS frameworks (id INTEGER PRIMARY KEY, name TEXT UNIQUE, prompt TEXT)''')
-    examples = [
-        ("Bloom's Taxonomy", "Generate questions aligned with Bloom's Taxonomy: 2 remembering, 2 understanding, 2 applying, 2 analyzing, 1 evaluating, 1 creating. Return in JSON format."),
-        ("Socratic Method", "Generate questions that encourage critical thinking and exploration, following the Socratic Method. Return 10 questions in JSON format."),
-        ("Simple Recall", "Generate straightforward recall questions to test basic comprehension of the text. Return 10 questions in JSON format.")
-    ]
-    c.executemany("INSERT OR IGNORE INTO frameworks (name, prompt) VALUES (?, ?)", examples)
-    conn.commit()
-    conn.close()
-
-def get_frameworks():
-    conn = sqlite3.connect("prompt_frameworks.db")
-    c = conn.cursor()
-    c.execute("SELECT name FROM frameworks")
-    frameworks = [row[0] for row in c.fetchall()]
-    conn.close()
-    return frameworks
-
-def get_prompt_by_name(name):
-    conn = sqlite3.connect("prompt_frameworks.db")
-    c = conn.cursor()
-    c.execute("SELECT prompt FROM frameworks WHERE name = ?", (name,))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else None
-
-def delete_framework(name):
-    conn = sqlite3.connect("prompt_frameworks.db")
-    c = conn.cursor()
-    c.execute("DELETE FROM frameworks WHERE name = ?", (name,))
-    conn.commit()
-    conn.close()
-
-init_db()
+import os
+import time
+import metrics
+from generation import DEFAULT_CONCURRENCY
+from exporters import DEFAULT_FORMATS, WRITERS
+from jobs import DONE, FAILED, QUEUED, RUNNING, export_artifact, job_queue, regenerate_job
+from providers import get_provider
+from response_cache import response_cache
+from slide_templates import CONTENT_TYPES
+from framework_store import framework_store
+
+rerun = getattr(st, "rerun", None) or st.experimental_rerun
+
+# Optional Prometheus-style endpoint for the process-wide stage timings.
+if os.environ.get("H5P_METRICS_PORT"):
+    metrics.serve_metrics(int(os.environ["H5P_METRICS_PORT"]))
 
 # API Client Setup
 api_options = ["Groq", "OpenAI", "Claude", "Google Gemini"]
 selected_api = st.sidebar.selectbox("Select API Provider", api_options)
 api_key = st.sidebar.text_input(f"Enter {selected_api} API Key", type="password", key=f"{selected_api}_key")
 
+st.sidebar.subheader("Fallback")
+fallback_api = st.sidebar.selectbox("Fallback API Provider", ["None"] + [api for api in api_options if api != selected_api])
+fallback_key = st.sidebar.text_input(f"Enter {fallback_api} API Key", type="password", key=f"{fallback_api}_fallback_key") if fallback_api != "None" else None
+hedge_after = st.sidebar.number_input("Hedge to fallback after (seconds, 0 = only on failure)", min_value=0, max_value=120, value=0) if fallback_api != "None" else 0
+
 def get_api_client(selected_api, api_key):
+    # Providers share pooled HTTP connections per API key across reruns.
     if not api_key:
         st.error(f"Please enter an API key for {selected_api}.")
         return None
-    if selected_api == "Groq":
-        return Groq(api_key=api_key)
-    elif selected_api == "OpenAI":
-        return OpenAI(api_key=api_key)
-    elif selected_api == "Claude":
-        return anthropic.Anthropic(api_key=api_key)
-    elif selected_api == "Google Gemini":
-        google_configure(api_key=api_key)
-        return GenerativeModel("gemini-1.5-flash")
-    return None
-
-def estimate_tokens(text):
-    words = len(text.split())
-    return int(words / 0.75)
-
-def trim_text_to_token_limit(text, max_tokens=4000):
-    words = text.split()
-    token_count = estimate_tokens(" ".join(words))
-    if token_count <= max_tokens:
-        return text
-    trimmed_words = words[:int(max_tokens * 0.75)]
-    trimmed_text = " ".join(trimmed_words)
-    return trimmed_text
-
-def generate_questions_with_api(client, selected_api, pdf_text, content_type, leading_prompt):
-    json_instruction = "Ensure the response is a valid JSON list of 10 objects, strictly formatted as requested, with no additional text."
-    if content_type == "Multiple Choice":
-        base_prompt = (
-            f"{leading_prompt}\n\n{json_instruction}\n\nFrom the following text, generate 10 multiple-choice questions, each with 4 options and one correct answer. "
-            f"Return the result as a JSON list of objects with 'question', 'options', and 'correct' keys.\n\nText:\n{pdf_text}"
-        )
-    elif content_type == "Fill in the Blanks":
-        base_prompt = (
-            f"{leading_prompt}\n\n{json_instruction}\n\nFrom the following text, generate 10 fill-in-the-blanks sentences, each with one blank and its answer. "
-            f"Return the result as a JSON list of objects with 'text' and 'answer' keys.\n\nText:\n{pdf_text}"
-        )
-    elif content_type == "True/False":
-        base_prompt = (
-            f"{leading_prompt}\n\n{json_instruction}\n\nFrom the following text, generate 10 true/false statements, each with a question and a correct answer (True or False). "
-            f"Return the result as a JSON list of objects with 'question' and 'correct' keys.\n\nText:\n{pdf_text}"
-        )
-    elif content_type == "Text":
-        base_prompt = (
-            f"{leading_prompt}\n\n{json_instruction}\n\nFrom the following text, generate 10 concise text snippets for presentation slides, each summarizing a key point. "
-            f"Return the result as a JSON list of objects with 'text' keys.\n\nText:\n{pdf_text}"
-        )
-
-    if selected_api == "Groq":
-        response = client.chat.completions.create(
-            model="mixtral-8x7b-32768",
-            messages=[
-                {"role": "system", "content": "You are an educational content creator. Follow the provided instructions precisely."},
-                {"role": "user", "content": base_prompt}
-            ],
-            max_tokens=2000,
-            temperature=0.7
-        )
-        return json.loads(response.choices[0].message.content)
-    elif selected_api == "OpenAI":
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are an educational content creator. Follow the provided instructions precisely."},
-                {"role": "user", "content": base_prompt}
-            ],
-            max_tokens=2000,
-            temperature=0.7
-        )
-        return json.loads(response.choices[0].message.content)
-    elif selected_api == "Claude":
-        response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=2000,
-            temperature=0.7,
-            system="You are an educational content creator. Follow the provided instructions precisely.",
-            messages=[{"role": "user", "content": base_prompt}]
-        )
-        return json.loads(response.content[0].text)
-    elif selected_api == "Google Gemini":
-        response = client.generate_content(base_prompt)
-        return json.loads(response.text)
-    return None
-
-def extract_text_from_pdf(pdf_file):
-    text = ""
-    with pdfplumber.open(pdf_file) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() or ""
-    return text
+    return get_provider(selected_api, api_key, None if fallback_api == "None" else fallback_api, fallback_key, hedge_after or None)
 
 # UI
 st.title("H5P Material Generator")
-st.write("Upload a PDF and generate a Course Presentation with 10 slides!")
-frameworks = get_frameworks()
+st.write("Upload a PDF and generate a Course Presentation with any number of slides!")
+frameworks = framework_store.names()
 framework_option = st.sidebar.selectbox("Choose a framework (optional)", ["None", "Custom"] + frameworks, key="framework")
 st.sidebar.subheader("Manage Frameworks")
 framework_to_delete = st.sidebar.selectbox("Select framework to delete", frameworks if frameworks else ["None"], key="delete_framework")
 delete_button = st.sidebar.button("Delete Framework")
+st.sidebar.subheader("Generation")
+concurrency = st.sidebar.number_input("Concurrent API calls", min_value=1, max_value=16, value=DEFAULT_CONCURRENCY)
+cache_stats = response_cache.stats()
+st.sidebar.caption(f"Response cache: {cache_stats['entries']} entries, {cache_stats['hits']} hits, {cache_stats['misses']} misses")
 
 pdf_file = st.file_uploader("Upload a PDF", type=["pdf"])
-content_type = st.selectbox("Choose Activity Type for Slides", ["Multiple Choice", "Fill in the Blanks", "True/False", "Text"])
+content_types = st.multiselect("Choose Activity Types for Slides", list(CONTENT_TYPES), default=["Multiple Choice"])
+slide_count = st.number_input("Number of slides", min_value=1, max_value=500, value=10)
+formats = st.multiselect("Export formats", list(WRITERS), default=DEFAULT_FORMATS, format_func=lambda name: WRITERS[name].label)
 default_prompt = "Generate clear, concise questions based on the provided text."
 prompt_input = st.text_area("Leading Prompt for LLM", value=default_prompt, height=100)
 generate_button = st.button("Generate Course Presentation")
 
 # Delete Logic
 if delete_button and framework_to_delete and framework_to_delete != "None":
-    delete_framework(framework_to_delete)
+    framework_store.delete(framework_to_delete)
     st.sidebar.success(f"Deleted '{framework_to_delete}' successfully!")
-    st.experimental_rerun()
+    rerun()
 
 # Generate Logic
-if generate_button and pdf_file:
+# Generation runs as a background job; the script only submits it and polls,
+# so widget interactions no longer cancel a run in progress.
+if generate_button and pdf_file and content_types:
     client = get_api_client(selected_api, api_key)
     if client:
-        pdf_text = extract_text_from_pdf(pdf_file)
-        if not pdf_text:
-            st.error("Failed to extract text from PDF.")
+        if framework_option == "Custom":
+            leading_prompt = prompt_input
+        elif framework_option == "None":
+            leading_prompt = default_prompt
         else:
-            trimmed_text = trim_text_to_token_limit(pdf_text, max_tokens=4000)
-            if trimmed_text != pdf_text:
-                st.warning("PDF text was trimmed to fit API token limits (approx. 4000 tokens). Some content may be excluded.")
-            
-            if framework_option == "Custom":
-                leading_prompt = prompt_input
-            elif framework_option == "None":
-                leading_prompt = default_prompt
-            else:
-                leading_prompt = get_prompt_by_name(framework_option) or default_prompt
-
-            st.write("Generating content with prompt:", leading_prompt)
-            content = generate_questions_with_api(client, selected_api, trimmed_text, content_type, leading_prompt)
-            if content:
-                st.write("Generated Content (first 2 of 10):", content[:2])
-                pdf_name = pdf_file.name.split(".")[0]
-                h5p_file, md_file = create_h5p_course_presentation(pdf_name, content_type, content, f"{pdf_name}_{content_type}_Presentation.h5p")
-                st.session_state["h5p_file"] = h5p_file  # Temporary storage in session state
-                st.session_state["md_file"] = md_file    # Temporary storage in session state
+            leading_prompt = framework_store.get_prompt(framework_option) or default_prompt
+
+        st.session_state["job_id"] = job_queue.submit(
+            {
+                "pdf_name": pdf_file.name.split(".")[0],
+                "content_types": content_types,
+                "slide_count": int(slide_count),
+                "formats": formats,
+                "leading_prompt": leading_prompt,
+                "concurrency": int(concurrency)
+            },
+            context={"provider": client},
+            inputs={"input.pdf": (pdf_file.getvalue(), "application/pdf")}
+        )
 
-# Display Download Buttons if Files Exist
-if "h5p_file" in st.session_state and "md_file" in st.session_state:
-    h5p_file = st.session_state["h5p_file"]
-    md_file = st.session_state["md_file"]
-    if os.path.exists(h5p_file) and os.path.exists(md_file):
-        col1, col2 = st.columns(2)
-        with col1:
-            with open(h5p_file, "rb") as f:
-                st.download_button("Download H5P Course Presentation", f, file_name=h5p_file, key="h5p_download")
-        with col2:
-            with open(md_file, "rb") as f:
-                st.download_button("Download Questions Markdown", f, file_name=md_file, key="md_download")
+# Job Status and Downloads
+if "job_id" in st.session_state:
+    st.sidebar.caption(f"Current job: {st.session_state['job_id']}")
+st.sidebar.text_input("Open job by ID", key="open_job_id", on_change=lambda: st.session_state.update(job_id=st.session_state["open_job_id"].strip()))
+job = job_queue.get(st.session_state["job_id"]) if "job_id" in st.session_state else None
+if "job_id" in st.session_state and job is None:
+    st.error("Job not found.")
+if job:
+    st.write("Generating content with prompt:", job["params"].get("leading_prompt"))
+    events = job_queue.store.events(job["id"])
+    items = [e["data"] for e in events if e["message"].startswith("Received")]
+    summary = next((e["data"] for e in reversed(events) if e["message"].startswith("Generated")), None)
+    if job["status"] in (QUEUED, RUNNING):
+        st.progress(job["progress"], text=job["message"])
+        if items:
+            st.caption(f"Received {len(items)} items so far")
+            st.write(items[-1])
+        time.sleep(1)
+        rerun()
+    elif job["status"] == FAILED:
+        st.error(f"Generation failed: {job['error']}")
     else:
-        st.error("Generated files not found. Please regenerate.")
-else:
-    if generate_button:
-        st.error("Failed to generate content from the selected API.")
+        if summary:
+            if summary.get("pages_used", 0) < summary.get("pages_total", 0):
+                st.info(f"Generated from {summary['chunks']} chunks sampled between pages {summary['first_page']} and {summary['last_page']}, using {summary['pages_used']} of {summary['pages_total']} pages.")
+            else:
+                st.info(f"Generated from {summary['chunks']} chunks covering pages {summary['first_page']}-{summary['last_page']}.")
+            if summary["failed_chunks"]:
+                st.warning(f"{summary['failed_chunks']} of {summary['chunks']} chunks failed and were skipped: {summary['errors'][0]}")
+        content = json.loads(job_queue.store.artifact(job["id"], "content.json") or "[]")
+        st.write(f"Generated Content (first 2 of {len(content)}):", content[:2])
+        writers = {writer.suffix: writer for writer in WRITERS.values()}
+        downloads = [(name, mime, writer) for name, mime in job_queue.store.artifacts(job["id"]) for suffix, writer in writers.items() if name.endswith(suffix)]
+        for col, (name, mime, writer) in zip(st.columns(len(downloads) or 1), downloads):
+            with col:
+                st.download_button(f"Download {writer.label}", job_queue.store.artifact(job["id"], name), file_name=name, mime=mime, key=f"download_{name}")
+        # Other formats are written from the stored items, without calling the model again.
+        exported = {writer.name for _, _, writer in downloads}
+        other = [name for name in WRITERS if name not in exported]
+        if other:
+            col1, col2 = st.columns([3, 1])
+            extra_format = col1.selectbox("Export in another format", other, format_func=lambda name: WRITERS[name].label)
+            if col2.button("Export"):
+                export_artifact(job_queue.store, job["id"], extra_format)
+                rerun()
+        # Regenerating a slide is a job of its own: one model call for that
+        # slide, then the job's files are patched.
+        regen = job_queue.get(st.session_state["regenerate_job_id"]) if "regenerate_job_id" in st.session_state else None
+        regen = regen if regen and regen["params"].get("job_id") == job["id"] else None
+        regenerating = regen is not None and regen["status"] in (QUEUED, RUNNING)
+        if job_queue.store.artifact(job["id"], "slides.json"):
+            col1, col2 = st.columns([3, 1])
+            slide_number = col1.number_input("Regenerate slide", min_value=1, max_value=max(len(content), 1), value=1)
+            if col2.button("Regenerate", disabled=regenerating):
+                client = get_api_client(selected_api, api_key)
+                if client:
+                    st.session_state["regenerate_job_id"] = job_queue.submit({"job_id": job["id"], "slide": int(slide_number)}, context={"provider": client}, runner=regenerate_job)
+                    rerun()
+        if regenerating:
+            st.info(f"Regenerating slide {regen['params']['slide']}...")
+            time.sleep(1)
+            rerun()
+        elif regen and regen["status"] == FAILED:
+            st.error(f"Regeneration failed: {regen['error']}")
+        elif regen:
+            st.success(f"Slide {regen['params']['slide']} regenerated:")
+            st.write(json.loads(job_queue.store.artifact(regen["id"], "item.json") or "{}"))
+    run_metrics = job_queue.store.artifact(job["id"], "metrics.json") if job["status"] in (DONE, FAILED) else None
+    if run_metrics:
+        run_summary = json.loads(run_metrics)
+        with st.expander(f"Timing summary ({run_summary['seconds']:.1f}s)"):
+            st.table([{"stage": name, "calls": s["count"], "seconds": s["seconds"], "max": s["max"]} for name, s in run_summary["spans"].items()])
+            if run_summary["counters"]:
+                st.table([{"counter": name, "value": value} for name, value in run_summary["counters"].items()])
@@ -0,0 +1,220 @@
+# batch.py
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import incremental
+import metrics
+from framework_store import framework_store
+from generation import DEFAULT_CONCURRENCY, agenerate_over_document, pages_covered
+from exporters import DEFAULT_FORMATS, WRITERS, export_files, writer_for
+from ir import build_presentation
+from llm import agenerate_questions
+from pdf_extract import MAX_WORKERS, MP_CONTEXT, iter_pages
+from providers import API_KEY_VARS, PROVIDERS, get_provider, run
+from slide_templates import CONTENT_TYPES
+from tokens import chunk_budget, counter_for
+
+DEFAULT_PROMPT = "Generate clear, concise questions based on the provided text."
+MANIFEST_NAME = "manifest.json"
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def glob_root(pattern):
+    # Directory part of a pattern before its first wildcard; outputs mirror
+    # the folders below it so files with the same name do not collide.
+    parts = []
+    for part in os.path.normpath(pattern).split(os.sep)[:-1]:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or os.curdir
+
+def _extract_file(path):
+    # Runs in a pool worker; each file is extracted serially there so the
+    # pool's parallelism is across files.
+    start = time.perf_counter()
+    pages = list(iter_pages(path, workers=1))
+    return pages, time.perf_counter() - start
+
+def load_manifest(path):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {"files": {}}
+
+def save_manifest(manifest, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def is_done(entry, input_hash, prompt_hash):
+    # Done means the generated items are on disk; missing export formats are
+    # written from them without calling the LLM again.
+    return (
+        entry is not None
+        and entry.get("status") == "done"
+        and entry.get("input_hash") == input_hash
+        and entry.get("prompt_hash") == prompt_hash
+        and os.path.exists(entry.get("content", ""))
+    )
+
+def missing_formats(entry, formats):
+    outputs = entry.get("outputs")
+    outputs = outputs if isinstance(outputs, dict) else {}
+    return [name for name in formats if not os.path.exists(outputs.get(name, ""))]
+
+def export_saved(entry, pdf_name, content_type, formats):
+    # Writes more formats next to the saved items. Entries from before slide
+    # manifests point at a plain list of items (*_content.json).
+    saved = incremental.load_manifest(entry["content"])
+    items = saved if isinstance(saved, list) else incremental.manifest_items(saved)
+    presentation = build_presentation(pdf_name, content_type, items)
+    output_dir = os.path.dirname(entry["content"])
+    outputs = entry["outputs"] if isinstance(entry.get("outputs"), dict) else {}
+    outputs.update(export_files(presentation, formats, output_dir))
+    entry["outputs"] = outputs
+
+async def convert_all(pdf_paths, content_types, provider, leading_prompt, output_dir, concurrency, workers, manifest_path, slide_count=10, formats=DEFAULT_FORMATS, roots=None):
+    # roots maps a PDF path to the folder its outputs are placed relative to
+    # (see glob_root); by default every PDF's outputs go straight into
+    # output_dir.
+    manifest = load_manifest(manifest_path)
+    prompt_hash = hashlib.sha256(f"{leading_prompt}\n{slide_count}".encode("utf-8")).hexdigest()
+    # One semaphore bounds provider calls across every file and content type.
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    loop = asyncio.get_running_loop()
+
+    async def generate(text, content_type):
+        async with semaphore:
+            return await agenerate_questions(provider, text, content_type, leading_prompt)
+
+    async def convert_file(path, executor):
+        input_hash = file_hash(path)
+        entries = manifest["files"].setdefault(path, {})
+        todo = [t for t in content_types if not is_done(entries.get(t), input_hash, prompt_hash)]
+        pdf_name = os.path.splitext(os.path.basename(path))[0]
+        root = (roots or {}).get(path, os.path.dirname(path))
+        file_dir = os.path.normpath(os.path.join(output_dir, os.path.relpath(os.path.dirname(path) or os.curdir, root)))
+        os.makedirs(file_dir, exist_ok=True)
+        for content_type in [t for t in content_types if t not in todo]:
+            missing = missing_formats(entries[content_type], formats)
+            if missing:
+                try:
+                    export_saved(entries[content_type], pdf_name, content_type, missing)
+                except Exception as e:
+                    print(f"fail  {path} [{content_type}] export: {type(e).__name__}: {e}", file=sys.stderr)
+                    continue
+                save_manifest(manifest, manifest_path)
+                print(f"export {path} [{content_type}] as {', '.join(missing)}")
+            else:
+                print(f"skip  {path} [{content_type}] (up to date)")
+        if not todo:
+            return
+
+        pages, extract_seconds = await loop.run_in_executor(executor, _extract_file, path)
+        for content_type in todo:
+            timings = {"extract": round(extract_seconds, 3)}
+            start = time.perf_counter()
+            try:
+                with metrics.run(f"{path} [{content_type}]") as run_metrics:
+                    content, chunks, errors = await agenerate_over_document(
+                        lambda text: generate(text, content_type),
+                        pages,
+                        n=slide_count,
+                        chunk_tokens=chunk_budget(provider),
+                        concurrency=concurrency,
+                        max_chunks=concurrency * 2,
+                        counter=counter_for(provider)
+                    )
+                    timings["generate"] = round(time.perf_counter() - start, 3)
+
+                    start = time.perf_counter()
+                    presentation = build_presentation(pdf_name, content_type, content)
+                    outputs = export_files(presentation, formats, file_dir)
+                    # The slide manifest doubles as the saved items for later exports.
+                    content_file = incremental.manifest_path(os.path.join(file_dir, writer_for("h5p").filename(presentation)))
+                    incremental.save_manifest(incremental.build_manifest(pdf_name, content_type, content, chunks, leading_prompt), content_file)
+                    timings["package"] = round(time.perf_counter() - start, 3)
+            except Exception as e:
+                entries[content_type] = {"input_hash": input_hash, "prompt_hash": prompt_hash, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+                save_manifest(manifest, manifest_path)
+                print(f"fail  {path} [{content_type}]: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+            entries[content_type] = {
+                "input_hash": input_hash,
+                "prompt_hash": prompt_hash,
+                "status": "done",
+                "content": content_file,
+                "outputs": outputs,
+                "items": len(content),
+                "chunks": len(chunks),
+                "pages_used": pages_covered(chunks),
+                "pages_total": len(pages),
+                "failed_chunks": len(errors),
+                "timings": timings,
+                "metrics": run_metrics.summary()
+            }
+            save_manifest(manifest, manifest_path)
+            print(f"done  {path} [{content_type}] in {sum(timings.values()):.1f}s")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=MP_CONTEXT) as executor:
+        await asyncio.gather(*(convert_file(path, executor) for path in pdf_paths))
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a folder of PDFs into H5P Course Presentations.")
+    parser.add_argument("pdfs", nargs="+", help="PDF paths or glob patterns, e.g. 'course/**/*.pdf'")
+    parser.add_argument("--types", nargs="+", choices=list(CONTENT_TYPES), default=["Multiple Choice"], help="Activity types to build for every PDF")
+    parser.add_argument("--provider", choices=list(PROVIDERS), default="Groq")
+    parser.add_argument("--api-key", help="API key (defaults to the provider's environment variable)")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT, help="Leading prompt for the LLM")
+    parser.add_argument("--framework", help="Use a saved framework's prompt instead of --prompt")
+    parser.add_argument("--slides", type=int, default=10, help="Slides per presentation")
+    parser.add_argument("--formats", nargs="+", choices=list(WRITERS), default=DEFAULT_FORMATS, help="Export formats to write")
+    parser.add_argument("--output-dir", default="h5p_output")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Maximum concurrent API calls")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Processes used for PDF extraction")
+    args = parser.parse_args(argv)
+
+    api_key = args.api_key or os.environ.get(API_KEY_VARS[args.provider])
+    if not api_key:
+        parser.error(f"no API key: pass --api-key or set {API_KEY_VARS[args.provider]}")
+
+    leading_prompt = args.prompt
+    if args.framework:
+        leading_prompt = framework_store.get_prompt(args.framework)
+        if leading_prompt is None:
+            parser.error(f"unknown framework {args.framework!r}; choose from {framework_store.names()}")
+
+    roots = {}
+    for pattern in args.pdfs:
+        for path in glob.glob(pattern, recursive=True):
+            roots.setdefault(path, glob_root(pattern))
+    pdf_paths = sorted(roots)
+    if not pdf_paths:
+        parser.error("no PDFs matched")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    provider = get_provider(args.provider, api_key)
+    start = time.perf_counter()
+    manifest = run(convert_all(pdf_paths, args.types, provider, leading_prompt, args.output_dir, args.concurrency, args.workers, manifest_path, args.slides, args.formats, roots))
+    failed = sum(1 for path in pdf_paths for e in manifest["files"].get(path, {}).values() if e.get("status") == "failed")
+    print(f"Finished {len(pdf_paths)} PDFs in {time.perf_counter() - start:.1f}s ({failed} failed). Manifest: {manifest_path}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+# benchmark.py
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import pdf_extract
+from generation import agenerate_over_document, estimate_tokens, trim_text_to_token_limit
+from h5p_builder import build_h5p_package, render_markdown
+from llm import agenerate_questions, build_prompt
+from selection import select_items
+
+WORDS = (
+    "cell energy photosynthesis membrane protein enzyme structure function system process "
+    "organism evolution population ecosystem nutrient molecule reaction climate water carbon "
+    "theory evidence experiment variable data model analysis history culture economy society"
+).split()
+DEFAULT_SIZES = [10, 100, 1000]
+CONTENT_TYPE = "Multiple Choice"
+
+def make_pdf(pages, lines_per_page=40, words_per_line=12, seed=0):
+    # Writes a plain PDF with Helvetica text lines, deterministic for a seed.
+    rng = random.Random(seed)
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None]
+    font_id = 3 + 2 * pages
+    kids = []
+    for p in range(pages):
+        page_id, content_id = 3 + 2 * p, 4 + 2 * p
+        kids.append(f"{page_id} 0 R")
+        lines = [f"BT /F1 10 Tf 50 760 Td 12 TL (Chapter {p // 10 + 1} page {p + 1}) Tj"]
+        for _ in range(lines_per_page):
+            lines.append("T* (" + " ".join(rng.choice(WORDS) for _ in range(words_per_line)) + ") Tj")
+        stream = "\n".join(lines) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {content_id} 0 R /Resources << /Font << /F1 {font_id} 0 R >> >> >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = [b"%PDF-1.4\n"]
+    offsets = []
+    size = len(out[0])
+    for number, body in enumerate(objects, 1):
+        offsets.append(size)
+        chunk = f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+        out.append(chunk)
+        size += len(chunk)
+    xref = [f"xref\n0 {len(objects) + 1}\n", "0000000000 65535 f \n"] + [f"{offset:010d} 00000 n \n" for offset in offsets]
+    out.append("".join(xref).encode("latin-1"))
+    out.append(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{size}\n%%EOF\n".encode("latin-1"))
+    return b"".join(out)
+
+class FakeProvider:
+    # Deterministic stand-in for a provider: returns canned JSON derived from
+    # the prompt after a fixed latency, streamed in small pieces.
+    name = "Fake"
+    model = "fake-1"
+
+    def __init__(self, latency=0.05, items=10, piece_size=64):
+        self.latency = latency
+        self.items = items
+        self.piece_size = piece_size
+
+    def reply(self, prompt):
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return json.dumps([
+            {
+                "question": f"Question {seed}-{i} about {WORDS[i % len(WORDS)]}?",
+                "options": ["A", "B", "C", "D"],
+                "correct": "A",
+                "text": f"Sentence {seed}-{i} with a ____.",
+                "answer": "blank",
+                "outline": f"Key point {seed}-{i}",
+                "notes": "Speaker notes."
+            }
+            for i in range(self.items)
+        ])
+
+    async def complete(self, prompt, system=None, sampling=None):
+        await asyncio.sleep(self.latency)
+        return self.reply(prompt)
+
+    async def stream(self, prompt, system=None, sampling=None):
+        await asyncio.sleep(self.latency)
+        reply = self.reply(prompt)
+        for i in range(0, len(reply), self.piece_size):
+            yield reply[i:i + self.piece_size]
+
+def fake_items(n):
+    return json.loads(FakeProvider(items=n).reply("items"))
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(max(own, children) * scale / (1 << 20), 1)
+
+def _generate(pages, latency, concurrency):
+    provider = FakeProvider(latency)
+    return asyncio.run(agenerate_over_document(
+        lambda text: agenerate_questions(provider, text, CONTENT_TYPE, "Benchmark prompt", cache=None),
+        pages,
+        n=10,
+        concurrency=concurrency,
+        max_chunks=concurrency * 2
+    ))
+
+def _stage(name, params):
+    # Returns (callable run once per repetition, units processed per run).
+    if name == "extract":
+        data = make_pdf(params["pages"])
+
+        def run():
+            pdf_extract._page_cache.clear()
+            return pdf_extract.extract_text_from_pdf(data)
+        return run, params["pages"]
+    if name in ("estimate_tokens", "trim_text", "prompt_build"):
+        text = pdf_extract.extract_text_from_pdf(make_pdf(params["pages"]))
+        if name == "estimate_tokens":
+            return lambda: estimate_tokens(text), params["pages"]
+        if name == "trim_text":
+            return lambda: trim_text_to_token_limit(text, 4000), params["pages"]
+        return lambda: build_prompt(trim_text_to_token_limit(text, 4000), CONTENT_TYPE, "Benchmark prompt"), 1
+    if name == "generate":
+        pages = list(pdf_extract.iter_pages(make_pdf(params["pages"])))
+        return lambda: _generate(pages, params["latency"], params["concurrency"]), params["pages"]
+    if name == "select":
+        # Candidates from several chunks, each appearing twice with different
+        # punctuation so deduplication has near-duplicates to cluster.
+        chunks = [fake_items(10) * 2 for _ in range(params["items"] // 20)]
+        for c, chunk in enumerate(chunks):
+            for i, item in enumerate(chunk):
+                chunk[i] = dict(item, question=f"{item['question']} chunk {c}" + "!" * (i // 10))
+        return lambda: select_items(chunks, params["n"]), params["items"]
+    if name == "markdown":
+        items = fake_items(params["items"])
+        return lambda: render_markdown(items, CONTENT_TYPE), params["items"]
+    if name == "h5p_package":
+        items = fake_items(params["items"])
+        return lambda: build_h5p_package("benchmark", CONTENT_TYPE, items), params["items"]
+    if name == "end_to_end":
+        data = make_pdf(params["pages"])
+
+        def run():
+            pdf_extract._page_cache.clear()
+            pages = list(pdf_extract.iter_pages(data))
+            content, _, _ = _generate(pages, params["latency"], params["concurrency"])
+            build_h5p_package("benchmark", CONTENT_TYPE, content)
+            render_markdown(content, CONTENT_TYPE)
+        return run, params["pages"]
+    raise ValueError(f"unknown stage {name!r}")
+
+def _measure(name, params, repeat, queue):
+    run, units = _stage(name, params)
+    run()  # warm-up
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    queue.put({
+        "stage": name,
+        "params": params,
+        "repeat": repeat,
+        "p50": round(statistics.median(latencies), 6),
+        "p95": round(latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))], 6),
+        "throughput": round(units / statistics.median(latencies), 2),
+        "units": units,
+        "peak_rss_mb": _peak_rss_mb()
+    })
+
+def measure(name, params, repeat):
+    # Each stage runs in a fresh process so its peak RSS is its own.
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure, args=(name, params, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+def plan(sizes, latency, concurrency):
+    cases = []
+    for pages in sizes:
+        for stage in ("extract", "estimate_tokens", "trim_text", "prompt_build", "generate", "end_to_end"):
+            cases.append((stage, {"pages": pages, "latency": latency, "concurrency": concurrency} if stage in ("generate", "end_to_end") else {"pages": pages}))
+    for items in (1000, 5000):
+        cases.append(("select", {"items": items, "n": 100}))
+    for items in (10, 100, 1000):
+        cases.append(("markdown", {"items": items}))
+        cases.append(("h5p_package", {"items": items}))
+    return cases
+
+def case_key(result):
+    return result["stage"] + "[" + ",".join(f"{k}={v}" for k, v in sorted(result["params"].items())) + "]"
+
+def compare(results, baseline, tolerance):
+    base = {case_key(r): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'case':60} {'p50':>10} {'baseline':>10} {'change':>8}")
+    for result in results:
+        key = case_key(result)
+        previous = base.get(key)
+        if previous is None:
+            print(f"{key:60} {result['p50']:>10.4f} {'-':>10} {'new':>8}")
+            continue
+        change = result["p50"] / previous["p50"] - 1 if previous["p50"] else 0.0
+        flag = " !" if change > tolerance else ""
+        print(f"{key:60} {result['p50']:>10.4f} {previous['p50']:>10.4f} {change:>+7.0%}{flag}")
+        if change > tolerance:
+            regressions.append(key)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction, prompt building, generation and H5P packaging.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Synthetic PDF page counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake provider latency per call (seconds)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--stages", nargs="+", help="Only run these stages")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50 slowdown before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = []
+    for stage, params in plan(args.sizes, args.latency, args.concurrency):
+        if args.stages and stage not in args.stages:
+            continue
+        result = measure(stage, params, args.repeat)
+        results.append(result)
+        print(f"{case_key(result):60} p50={result['p50']:.4f}s p95={result['p95']:.4f}s {result['throughput']:>10}/s rss={result['peak_rss_mb']}MB")
+
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(), "time": time.time()},
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+# exporters.py
+import csv
+import io
+import os
+import zipfile
+from contextlib import contextmanager
+from xml.sax.saxutils import escape, quoteattr
+
+import metrics
+from h5p_builder import build_h5p_package, markdown_for_item, markdown_header
+from ir import FillInTheBlanks, MultipleChoice, TextSlide, TrueFalse
+
+# Writers stream a Presentation (see ir.py) to a binary stream. Exporting to
+# another format only needs the stored items, never the PDF or the model.
+class Writer:
+    def __init__(self, name, label, suffix, mime, write):
+        self.name = name
+        self.label = label
+        self.suffix = suffix
+        self.mime = mime
+        self.write = write
+
+    def filename(self, presentation):
+        return f"{presentation.name}_{presentation.content_type}{self.suffix}".replace("/", "-")
+
+WRITERS = {}
+
+def register(writer):
+    WRITERS[writer.name] = writer
+    return writer
+
+def writer_for(name):
+    return WRITERS[name]
+
+@contextmanager
+def _text(stream):
+    # Text view over a binary stream that leaves the stream open afterwards.
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    try:
+        yield text
+    finally:
+        text.flush()
+        text.detach()
+
+def write_h5p(presentation, stream):
+    build_h5p_package(presentation.name, presentation.content_type, (slide.as_item() for slide in presentation.slides), stream)
+
+def write_markdown(presentation, stream):
+    with _text(stream) as out:
+        out.write(markdown_header(presentation.content_type))
+        for number, slide in enumerate(presentation.slides, 1):
+            out.write(markdown_for_item(slide.as_item(), number, presentation.content_type))
+
+def _gift_escape(text):
+    for ch in "\\~=#{}:":
+        text = text.replace(ch, "\\" + ch)
+    return text.replace("\n", " ")
+
+def _gift_question(slide, number):
+    if isinstance(slide, MultipleChoice):
+        answers = " ".join(("=" if option == slide.correct else "~") + _gift_escape(option) for option in slide.options)
+        return f"::Question {number}:: {_gift_escape(slide.question)} {{{answers}}}"
+    if isinstance(slide, FillInTheBlanks):
+        before, _, after = slide.text.partition("____")
+        return f"::Sentence {number}:: {_gift_escape(before)}{{={_gift_escape(slide.answer)}}}{_gift_escape(after)}"
+    if isinstance(slide, TrueFalse):
+        return f"::Statement {number}:: {_gift_escape(slide.question)} {{{'TRUE' if slide.correct else 'FALSE'}}}"
+    # Text slides become GIFT descriptions (no answer).
+    return f"::Slide {number}:: {_gift_escape(slide.outline)}"
+
+def write_gift(presentation, stream):
+    with _text(stream) as out:
+        for number, slide in enumerate(presentation.slides, 1):
+            out.write(_gift_question(slide, number) + "\n\n")
+
+def _moodle_answer(fraction, text):
+    return f'    <answer fraction="{fraction}" format="plain_text"><text>{escape(text)}</text></answer>\n'
+
+def _moodle_question(slide, number):
+    if isinstance(slide, MultipleChoice):
+        kind, name, text = "multichoice", f"Question {number}", slide.question
+        body = "".join(_moodle_answer(100 if option == slide.correct else 0, option) for option in slide.options)
+        body += "    <single>true</single>\n    <shuffleanswers>true</shuffleanswers>\n"
+    elif isinstance(slide, FillInTheBlanks):
+        kind, name, text = "shortanswer", f"Sentence {number}", slide.text
+        body = _moodle_answer(100, slide.answer)
+    elif isinstance(slide, TrueFalse):
+        kind, name, text = "truefalse", f"Statement {number}", slide.question
+        body = _moodle_answer(100 if slide.correct else 0, "true") + _moodle_answer(0 if slide.correct else 100, "false")
+    else:
+        kind, name, text = "description", f"Slide {number}", f"{slide.outline}\n\n{slide.notes}"
+        body = ""
+    return (
+        f'  <question type="{kind}">\n'
+        f"    <name><text>{escape(name)}</text></name>\n"
+        f'    <questiontext format="plain_text"><text>{escape(text)}</text></questiontext>\n'
+        f"{body}  </question>\n"
+    )
+
+def write_moodle_xml(presentation, stream):
+    with _text(stream) as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n<quiz>\n')
+        for number, slide in enumerate(presentation.slides, 1):
+            out.write(_moodle_question(slide, number))
+        out.write("</quiz>\n")
+
+QTI_NS = 'xmlns="http://www.imsglobal.org/xsd/imsqti_v2p1"'
+
+def _qti_item(slide, identifier, number):
+    if isinstance(slide, (MultipleChoice, TrueFalse)):
+        if isinstance(slide, MultipleChoice):
+            title, prompt, options, correct = f"Question {number}", slide.question, slide.options, slide.correct
+        else:
+            title, prompt, options, correct = f"Statement {number}", slide.question, ("True", "False"), "True" if slide.correct else "False"
+        choices = "".join(f'      <simpleChoice identifier="C{i}">{escape(option)}</simpleChoice>\n' for i, option in enumerate(options))
+        value = f"C{options.index(correct)}"
+        declaration = '<responseDeclaration identifier="RESPONSE" cardinality="single" baseType="identifier">'
+        interaction = f'    <choiceInteraction responseIdentifier="RESPONSE" shuffle="false" maxChoices="1">\n      <prompt>{escape(prompt)}</prompt>\n{choices}    </choiceInteraction>\n'
+    else:
+        title, value = f"Sentence {number}", escape(slide.answer)
+        before, _, after = slide.text.partition("____")
+        declaration = '<responseDeclaration identifier="RESPONSE" cardinality="single" baseType="string">'
+        interaction = f'    <p>{escape(before)}<textEntryInteraction responseIdentifier="RESPONSE"/>{escape(after)}</p>\n'
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<assessmentItem {QTI_NS} identifier="{identifier}" title={quoteattr(title)} adaptive="false" timeDependent="false">\n'
+        f"  {declaration}<correctResponse><value>{value}</value></correctResponse></responseDeclaration>\n"
+        '  <outcomeDeclaration identifier="SCORE" cardinality="single" baseType="float"/>\n'
+        f"  <itemBody>\n{interaction}  </itemBody>\n"
+        '  <responseProcessing template="http://www.imsglobal.org/question/qti_v2p1/rptemplates/match_correct"/>\n'
+        "</assessmentItem>\n"
+    )
+
+def write_qti(presentation, stream):
+    # QTI 2.1 content package: one assessmentItem file per question plus the
+    # manifest. Text slides carry no interaction and are left out.
+    resources = []
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as package:
+        for number, slide in enumerate(presentation.slides, 1):
+            if isinstance(slide, TextSlide):
+                continue
+            identifier = f"item{number}"
+            package.writestr(f"items/{identifier}.xml", _qti_item(slide, identifier, number))
+            resources.append(identifier)
+        package.writestr("imsmanifest.xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<manifest xmlns="http://www.imsglobal.org/xsd/imscp_v1p1" identifier="manifest">\n'
+            "  <organizations/>\n  <resources>\n"
+            + "".join(f'    <resource identifier="{r}" type="imsqti_item_xmlv2p1" href="items/{r}.xml"><file href="items/{r}.xml"/></resource>\n' for r in resources)
+            + "  </resources>\n</manifest>\n"
+        ))
+
+def write_csv(presentation, stream):
+    with _text(stream) as out:
+        writer = csv.writer(out)
+        writer.writerow(["number", "type", "question", "options", "answer", "notes"])
+        for number, slide in enumerate(presentation.slides, 1):
+            if isinstance(slide, MultipleChoice):
+                row = [slide.question, " | ".join(slide.options), slide.correct, ""]
+            elif isinstance(slide, FillInTheBlanks):
+                row = [slide.text, "", slide.answer, ""]
+            elif isinstance(slide, TrueFalse):
+                row = [slide.question, "True | False", str(slide.correct), ""]
+            else:
+                row = [slide.outline, "", "", slide.notes]
+            writer.writerow([number, slide.content_type] + row)
+
+register(Writer("h5p", "H5P Course Presentation", "_Presentation.h5p", "application/zip", write_h5p))
+register(Writer("markdown", "Questions Markdown", "_Questions.md", "text/markdown", write_markdown))
+register(Writer("gift", "Moodle GIFT", "_Questions.gift", "text/plain", write_gift))
+register(Writer("moodle_xml", "Moodle XML", "_Moodle.xml", "application/xml", write_moodle_xml))
+register(Writer("qti", "QTI 2.1 Package", "_QTI.zip", "application/zip", write_qti))
+register(Writer("csv", "CSV", "_Questions.csv", "text/csv", write_csv))
+
+DEFAULT_FORMATS = ["h5p", "markdown"]
+
+def export_bytes(presentation, name):
+    stream = io.BytesIO()
+    with metrics.span("export", format=name):
+        writer_for(name).write(presentation, stream)
+    return stream.getvalue()
+
+def export_files(presentation, formats=DEFAULT_FORMATS, output_dir=None):
+    # Returns {format: path} for every format written.
+    paths = {}
+    for name in formats:
+        writer = writer_for(name)
+        path = os.path.join(output_dir or "", writer.filename(presentation))
+        with metrics.span("export", format=name), open(path, "wb") as f:
+            writer.write(presentation, f)
+        paths[name] = path
+    return paths
@@ -0,0 +1,78 @@
+# framework_store.py
+import sqlite3
+import threading
+
+SCHEMA_VERSION = 1
+EXAMPLES = [
+    ("Bloom's Taxonomy", "Generate questions aligned with Bloom's Taxonomy: 2 remembering, 2 understanding, 2 applying, 2 analyzing, 1 evaluating, 1 creating. Return in JSON format."),
+    ("Socratic Method", "Generate questions that encourage critical thinking and exploration, following the Socratic Method. Return 10 questions in JSON format."),
+    ("Simple Recall", "Generate straightforward recall questions to test basic comprehension of the text. Return 10 questions in JSON format.")
+]
+
+SELECT_ALL = "SELECT name, prompt FROM frameworks ORDER BY id"
+UPSERT = "INSERT INTO frameworks (name, prompt) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET prompt = excluded.prompt"
+DELETE = "DELETE FROM frameworks WHERE name = ?"
+
+class FrameworkStore:
+    # One long-lived WAL connection shared by every session in the process.
+    # The name -> prompt map is cached and only reloaded after a write, here
+    # or from another connection (detected through PRAGMA data_version).
+    def __init__(self, path="prompt_frameworks.db"):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+        self._frameworks = None
+        self._data_version = None
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=32)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Schema and examples are applied once per database file, so a
+            # deleted example framework stays deleted.
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                with conn:
+                    conn.execute('''CREATE TABLE IF NOT EXISTS frameworks (id INTEGER PRIMARY KEY, name TEXT UNIQUE, prompt TEXT)''')
+                    conn.executemany("INSERT OR IGNORE INTO frameworks (name, prompt) VALUES (?, ?)", EXAMPLES)
+                    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn = conn
+        return self._conn
+
+    def _load(self):
+        conn = self._connect()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._frameworks is None or data_version != self._data_version:
+            self._frameworks = dict(conn.execute(SELECT_ALL).fetchall())
+            self._data_version = data_version
+        return self._frameworks
+
+    def names(self):
+        with self._lock:
+            return list(self._load())
+
+    def get_prompt(self, name):
+        with self._lock:
+            return self._load().get(name)
+
+    def save(self, name, prompt):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(UPSERT, (name, prompt))
+            self._frameworks = None
+
+    def delete(self, name):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(DELETE, (name,))
+            self._frameworks = None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._frameworks = None
+
+framework_store = FrameworkStore()
@@ -0,0 +1,155 @@
+# generation.py
+import asyncio
+import math
+from collections import deque
+
+import metrics
+from providers import run
+from selection import select_items
+from tokens import count_tokens, counter_for, truncate_tokens
+
+DEFAULT_CHUNK_TOKENS = 4000
+DEFAULT_CONCURRENCY = 4
+# Items each chunk prompt asks for (see llm.build_prompt).
+ITEMS_PER_CHUNK = 10
+
+def estimate_tokens(text, counter=None):
+    return count_tokens(text, counter)
+
+def trim_text_to_token_limit(text, max_tokens=DEFAULT_CHUNK_TOKENS, counter=None):
+    return truncate_tokens(text, max_tokens, counter)
+
+def _split_oversized(text, max_tokens, counter):
+    # A single page over the budget is cut along line boundaries, and a single
+    # line over the budget at token boundaries.
+    parts, current, current_tokens = [], [], 0
+    for line in text.split("\n"):
+        pieces = []
+        while line:
+            piece = counter.truncate(line, max_tokens)
+            if piece == line or not piece:
+                break
+            pieces.append(piece)
+            line = line[len(piece):].lstrip()
+        pieces.append(line)
+        for piece in pieces:
+            piece_tokens = counter.count(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                parts.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        parts.append("\n".join(current))
+    return parts
+
+def chunk_pages(pages, max_tokens=DEFAULT_CHUNK_TOKENS, counter=None):
+    # Packs whole pages into chunks of at most max_tokens (as counted by
+    # counter). Each chunk is a dict with the first and last page it covers,
+    # so selection can spread items across the document.
+    counter = counter or counter_for()
+    chunks, current, current_tokens, first_page, last_page = [], [], 0, None, None
+    for page_no, text in pages:
+        text_tokens = counter.count(text)
+        parts = [(text, text_tokens)] if text_tokens <= max_tokens else [(part, counter.count(part)) for part in _split_oversized(text, max_tokens, counter)]
+        for part, part_tokens in parts:
+            if current and current_tokens + part_tokens > max_tokens:
+                chunks.append({"first_page": first_page, "last_page": last_page, "text": "\n".join(current)})
+                current, current_tokens = [], 0
+            if not current:
+                first_page = page_no
+            current.append(part)
+            current_tokens += part_tokens
+            last_page = page_no
+    if current:
+        chunks.append({"first_page": first_page, "last_page": last_page, "text": "\n".join(current)})
+    return [chunk for chunk in chunks if chunk["text"].strip()]
+
+def pages_covered(chunks):
+    # Number of distinct pages the chunks were built from; with max_chunks
+    # this can be far fewer than the document has.
+    return len({page for chunk in chunks for page in range(chunk["first_page"], chunk["last_page"] + 1)})
+
+def spread_chunks(chunks, max_chunks):
+    # Keeps at most max_chunks chunks, evenly spaced through the document.
+    if max_chunks is None or len(chunks) <= max_chunks:
+        return chunks
+    step = len(chunks) / max_chunks
+    return [chunks[int(i * step)] for i in range(max_chunks)]
+
+async def map_chunks(generate, chunks, concurrency=DEFAULT_CONCURRENCY, semaphore=None):
+    # Awaits generate(chunk_text) for every chunk, at most `concurrency` at a
+    # time (or as many as a shared semaphore allows). A failing chunk
+    # contributes no items instead of failing the run.
+    semaphore = semaphore or asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(chunk):
+        async with semaphore:
+            try:
+                return await generate(chunk["text"]), None
+            except Exception as e:
+                return None, e
+
+    results = await asyncio.gather(*(run_one(chunk) for chunk in chunks))
+    errors = [error for _, error in results if error is not None]
+    if chunks and len(errors) == len(chunks):
+        raise errors[0]
+    return [items for items, _ in results], errors
+
+def mix_items(item_lists, types):
+    # Interleaves per-type item lists round-robin, tagging every item with its
+    # activity type, for mixed-type presentations.
+    queues = [deque({**item, "type": t} for item in items) for items, t in zip(item_lists, types)]
+    mixed = []
+    while any(queues):
+        for queue in queues:
+            if queue:
+                mixed.append(queue.popleft())
+    return mixed
+
+async def agenerate_over_document(generate, pages, n=10, chunk_tokens=DEFAULT_CHUNK_TOKENS, concurrency=DEFAULT_CONCURRENCY, max_chunks=None, counter=None, semaphore=None):
+    # Large slide counts need enough chunks to supply n items.
+    if max_chunks is not None:
+        max_chunks = max(max_chunks, math.ceil(n / ITEMS_PER_CHUNK))
+    with metrics.span("chunk"):
+        chunks = spread_chunks(chunk_pages(pages, chunk_tokens, counter), max_chunks)
+    chunk_items, errors = await map_chunks(generate, chunks, concurrency, semaphore)
+    metrics.incr("chunk_failures", len(errors))
+    # Each item records the page range it came from (0-based), so a single
+    # slide can later be regenerated from the same text.
+    for chunk, items in zip(chunks, chunk_items):
+        for item in items or []:
+            if isinstance(item, dict):
+                item["pages"] = [chunk["first_page"], chunk["last_page"]]
+    with metrics.span("select", candidates=sum(len(items or []) for items in chunk_items)):
+        return select_items(chunk_items, n), chunks, errors
+
+def generate_over_document(generate, pages, n=10, chunk_tokens=DEFAULT_CHUNK_TOKENS, concurrency=DEFAULT_CONCURRENCY, max_chunks=None, counter=None):
+    return run(agenerate_over_document(generate, pages, n, chunk_tokens, concurrency, max_chunks, counter))
+
+async def agenerate_mixed(generate, pages, content_types, n=10, chunk_tokens=DEFAULT_CHUNK_TOKENS, concurrency=DEFAULT_CONCURRENCY, max_chunks=None, counter=None):
+    # Splits n slides across content_types, generates each type over the
+    # document concurrently (generate takes the chunk text and a content type)
+    # and interleaves the results, every item tagged with its type. Types
+    # with no share of n (n < len(content_types)) are not generated. All
+    # types share one semaphore, so at most `concurrency` calls run in total.
+    # A type whose every chunk failed only adds its error; the run fails when
+    # no type produced items. The returned chunks are those used by any
+    # type, in document order.
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    shares = [n // len(content_types) + (1 if i < n % len(content_types) else 0) for i in range(len(content_types))]
+    types = [(t, share) for t, share in zip(content_types, shares) if share > 0]
+
+    async def generate_type(t, share):
+        try:
+            return await agenerate_over_document(lambda text: generate(text, t), pages, share, chunk_tokens, concurrency, max_chunks, counter, semaphore)
+        except Exception as e:
+            return [], [], [e]
+
+    results = await asyncio.gather(*(generate_type(t, share) for t, share in types))
+    items = mix_items([items for items, _, _ in results], [t for t, _ in types])
+    errors = [error for _, _, type_errors in results for error in type_errors]
+    if not items and errors:
+        raise errors[0]
+    chunks = {(c["first_page"], c["last_page"]): c for _, type_chunks, _ in results for c in type_chunks}
+    return items, [chunks[key] for key in sorted(chunks)], errors
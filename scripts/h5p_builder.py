@@ -1,232 +1,170 @@
 # h5p_builder.py
+import io
 import json
 import zipfile
 import os
+import metrics
+from slide_templates import Field, JSONTemplate, preloaded_dependencies, template_for
+
+def markdown_for_item(item, number, content_type):
+    content_type = item.get("type", content_type)
+    if content_type == "Multiple Choice":
+        lines = [f"## Question {number}: {item['question']}\n", "Options:\n"]
+        for j, opt in enumerate(item["options"], 1):
+            marker = "*" if opt == item["correct"] else "-"
+            lines.append(f"  {marker} {j}. {opt}\n")
+        lines.append(f"**Correct Answer**: {item['correct']}\n\n")
+        return "".join(lines)
+    elif content_type == "Fill in the Blanks":
+        return f"## Sentence {number}: {item['text']}\n**Answer**: {item['answer']}\n\n"
+    elif content_type == "True/False":
+        return f"## Statement {number}: {item['question']}\n**Answer**: {item['correct']}\n\n"
+    elif content_type == "Text":
+        outline = item.get("outline", "No outline provided.")
+        notes = item.get("notes", "No speaker notes provided.")
+        return f"## Slide {number}: {outline}\n**Speaker Notes**: {notes}\n\n"
+    return ""
+
+def markdown_header(content_type):
+    return f"# {content_type} Questions and Answers\n\n"
+
+def render_markdown(content_data, content_type):
+    with metrics.span("markdown"):
+        parts = [markdown_header(content_type)]
+        parts.extend(markdown_for_item(item, i, content_type) for i, item in enumerate(content_data, 1))
+        return "".join(parts)
 
 def generate_markdown(content_data, content_type, output_filename="questions.md"):
-    markdown_content = f"# {content_type} Questions and Answers\n\n"
-    for i, item in enumerate(content_data[:10], 1):
-        if content_type == "Multiple Choice":
-            markdown_content += f"## Question {i}: {item['question']}\n"
-            markdown_content += "Options:\n"
-            for j, opt in enumerate(item["options"], 1):
-                marker = "*" if opt == item["correct"] else "-"
-                markdown_content += f"  {marker} {j}. {opt}\n"
-            markdown_content += f"**Correct Answer**: {item['correct']}\n\n"
-        elif content_type == "Fill in the Blanks":
-            markdown_content += f"## Sentence {i}: {item['text']}\n"
-            markdown_content += f"**Answer**: {item['answer']}\n\n"
-        elif content_type == "True/False":
-            markdown_content += f"## Statement {i}: {item['question']}\n"
-            markdown_content += f"**Answer**: {item['correct']}\n\n"
-        elif content_type == "Text":
-            outline = item.get("outline", "No outline provided.")
-            notes = item.get("notes", "No speaker notes provided.")
-            markdown_content += f"## Slide {i}: {outline}\n"
-            markdown_content += f"**Speaker Notes**: {notes}\n\n"
-    
-    with open(output_filename, "w", encoding="utf-8") as f:
-        f.write(markdown_content)
+    with metrics.span("markdown"), open(output_filename, "w", encoding="utf-8") as f:
+        f.write(markdown_header(content_type))
+        for i, item in enumerate(content_data, 1):
+            f.write(markdown_for_item(item, i, content_type))
     return output_filename
 
-def create_h5p_course_presentation(pdf_name, content_type, content_data, output_filename="output.h5p"):
-    h5p_data = {
+# The constant content.json wrapper (presentation settings, override and
+# l10n blocks) is serialized once; builds only splice in the slides.
+PRESENTATION_TEMPLATE = JSONTemplate({
+    "presentation": {
+        "slides": Field("slides"),
+        "keywordListEnabled": True,
+        "globalBackgroundSelector": {},
+        "keywordListAlwaysShow": False,
+        "keywordListAutoHide": False,
+        "keywordListOpacity": 90
+    },
+    "override": {
+        "activeSurface": False,
+        "hideSummarySlide": False,
+        "summarySlideSolutionButton": True,
+        "summarySlideRetryButton": True,
+        "enablePrintButton": False,
+        "social": {
+            "showFacebookShare": False,
+            "facebookShare": {"url": "@currentpageurl", "quote": "I scored @score out of @maxScore on a task at @currentpageurl."},
+            "showTwitterShare": False,
+            "twitterShare": {"statement": "I scored @score out of @maxScore on a task at @currentpageurl.", "url": "@currentpageurl", "hashtags": "h5p, course"},
+            "showGoogleShare": False,
+            "googleShareUrl": "@currentpageurl"
+        }
+    },
+    "l10n": {
+        "slide": "Slide",
+        "score": "Score",
+        "yourScore": "Your Score",
+        "maxScore": "Max Score",
+        "total": "Total",
+        "totalScore": "Total Score",
+        "showSolutions": "Show solutions",
+        "retry": "Retry",
+        "exportAnswers": "Export text",
+        "hideKeywords": "Hide sidebar navigation menu",
+        "showKeywords": "Show sidebar navigation menu",
+        "fullscreen": "Fullscreen",
+        "exitFullscreen": "Exit fullscreen",
+        "prevSlide": "Previous slide",
+        "nextSlide": "Next slide",
+        "currentSlide": "Current slide",
+        "lastSlide": "Last slide",
+        "solutionModeTitle": "Exit solution mode",
+        "solutionModeText": "Solution Mode",
+        "summaryMultipleTaskText": "Multiple tasks",
+        "scoreMessage": "You achieved:",
+        "shareFacebook": "Share on Facebook",
+        "shareTwitter": "Share on Twitter",
+        "shareGoogle": "Share on Google+",
+        "summary": "Summary",
+        "solutionsButtonTitle": "Show comments"
+    }
+})
+
+def build_h5p_data(pdf_name):
+    return {
         "title": f"Course Presentation from {pdf_name}",
         "mainLibrary": "H5P.CoursePresentation",
         "language": "en",
         "embedTypes": ["iframe"],
         "preloadedDependencies": [
-            {"machineName": "H5P.CoursePresentation", "majorVersion": "1", "minorVersion": "22"},
-            {"machineName": "H5P.MultiChoice", "majorVersion": "1", "minorVersion": "14"},
-            {"machineName": "H5P.Blanks", "majorVersion": "1", "minorVersion": "12"},
-            {"machineName": "H5P.TrueFalse", "majorVersion": "1", "minorVersion": "8"},
-            {"machineName": "H5P.AdvancedText", "majorVersion": "1", "minorVersion": "1"}
-        ]
+            {"machineName": "H5P.CoursePresentation", "majorVersion": "1", "minorVersion": "22"}
+        ] + preloaded_dependencies()
     }
 
-    output_filename = output_filename.replace("/", "-")
-
-    slides = []
-    for i in range(10):
-        if content_type == "Multiple Choice":
-            item = content_data[i] if i < len(content_data) else {"question": f"Question {i+1}", "options": ["A", "B", "C", "D"], "correct": "A"}
-            slide = {
-                "elements": [
-                    {
-                        "x": 5, "y": 5, "width": 90, "height": 90,
-                        "action": {
-                            "library": "H5P.MultiChoice 1.14",
-                            "params": {
-                                "question": item["question"],
-                                "answers": [{"text": opt, "correct": opt == item["correct"]} for opt in item["options"]],
-                                "behaviour": {
-                                    "enableRetry": True,
-                                    "enableSolutionsButton": True,
-                                    "singlePoint": False,
-                                    "showSolutions": True
-                                },
-                                "l10n": {"showSolutions": "Show solutions", "retry": "Retry"}
-                            },
-                            "subContentId": f"slide-{i+1}-mc-{os.urandom(4).hex()}"
-                        }
-                    }
-                ],
-                "title": f"Question {i+1}",
-                "slideBackgroundSelector": {}
-            }
-        elif content_type == "Fill in the Blanks":
-            item = content_data[i] if i < len(content_data) else {"text": f"Sentence {i+1} ____.", "answer": "missing"}
-            formatted_text = item["text"].replace("____", f"*{item['answer']}*")
-            slide = {
-                "elements": [
-                    {
-                        "x": 5, "y": 5, "width": 90, "height": 90,
-                        "action": {
-                            "library": "H5P.Blanks 1.12",
-                            "params": {
-                                "text": formatted_text,
-                                "behaviour": {
-                                    "enableRetry": True,
-                                    "enableSolutionsButton": True,
-                                    "showSolutions": True
-                                }
-                            },
-                            "subContentId": f"slide-{i+1}-blanks-{os.urandom(4).hex()}"
-                        }
-                    }
-                ],
-                "title": f"Sentence {i+1}",
-                "slideBackgroundSelector": {}
-            }
-        elif content_type == "True/False":
-            item = content_data[i] if i < len(content_data) else {"question": f"Statement {i+1}", "correct": True}
-            correct_value = item["correct"]
-            if isinstance(correct_value, str):
-                correct_value = correct_value.lower() == "true"
-            slide = {
-                "elements": [
-                    {
-                        "x": 5, "y": 5, "width": 90, "height": 90,
-                        "action": {
-                            "library": "H5P.TrueFalse 1.8",
-                            "params": {
-                                "question": item["question"],
-                                "correct": correct_value,
-                                "behaviour": {
-                                    "enableRetry": True,
-                                    "enableSolutionsButton": True,
-                                    "showSolutions": True
-                                }
-                            },
-                            "subContentId": f"slide-{i+1}-tf-{os.urandom(4).hex()}"
-                        }
-                    }
-                ],
-                "title": f"Statement {i+1}",
-                "slideBackgroundSelector": {}
-            }
-        elif content_type == "Text":
-            item = content_data[i] if i < len(content_data) else {"outline": f"Slide {i+1} Outline", "notes": "No notes"}
-            outline = item.get("outline", item.get("text", f"Slide {i+1} Outline"))
-            notes = item.get("notes", "No speaker notes provided.")
-            slide = {
-                "elements": [
-                    {
-                        "x": 5, "y": 5, "width": 90, "height": 40,
-                        "action": {
-                            "library": "H5P.AdvancedText 1.1",
-                            "params": {
-                                "text": f"<h3>{outline}</h3>"
-                            },
-                            "subContentId": f"slide-{i+1}-text-outline-{os.urandom(4).hex()}"
-                        }
-                    },
-                    {
-                        "x": 5, "y": 50, "width": 90, "height": 40,
-                        "action": {
-                            "library": "H5P.AdvancedText 1.1",
-                            "params": {
-                                "text": f"<p><em>Speaker Notes:</em> {notes}</p>"
-                            },
-                            "subContentId": f"slide-{i+1}-text-notes-{os.urandom(4).hex()}"
-                        }
-                    }
-                ],
-                "title": f"Slide {i+1}",
-                "slideBackgroundSelector": {}
-            }
-        slides.append(slide)
-
-    content_data_json = {
-        "presentation": {
-            "slides": slides,
-            "keywordListEnabled": True,
-            "globalBackgroundSelector": {},
-            "keywordListAlwaysShow": False,
-            "keywordListAutoHide": False,
-            "keywordListOpacity": 90
-        },
-        "override": {
-            "activeSurface": False,
-            "hideSummarySlide": False,
-            "summarySlideSolutionButton": True,
-            "summarySlideRetryButton": True,
-            "enablePrintButton": False,
-            "social": {
-                "showFacebookShare": False,
-                "facebookShare": {"url": "@currentpageurl", "quote": "I scored @score out of @maxScore on a task at @currentpageurl."},
-                "showTwitterShare": False,
-                "twitterShare": {"statement": "I scored @score out of @maxScore on a task at @currentpageurl.", "url": "@currentpageurl", "hashtags": "h5p, course"},
-                "showGoogleShare": False,
-                "googleShareUrl": "@currentpageurl"
-            }
-        },
-        "l10n": {
-            "slide": "Slide",
-            "score": "Score",
-            "yourScore": "Your Score",
-            "maxScore": "Max Score",
-            "total": "Total",
-            "totalScore": "Total Score",
-            "showSolutions": "Show solutions",
-            "retry": "Retry",
-            "exportAnswers": "Export text",
-            "hideKeywords": "Hide sidebar navigation menu",
-            "showKeywords": "Show sidebar navigation menu",
-            "fullscreen": "Fullscreen",
-            "exitFullscreen": "Exit fullscreen",
-            "prevSlide": "Previous slide",
-            "nextSlide": "Next slide",
-            "currentSlide": "Current slide",
-            "lastSlide": "Last slide",
-            "solutionModeTitle": "Exit solution mode",
-            "solutionModeText": "Solution Mode",
-            "summaryMultipleTaskText": "Multiple tasks",
-            "scoreMessage": "You achieved:",
-            "shareFacebook": "Share on Facebook",
-            "shareTwitter": "Share on Twitter",
-            "shareGoogle": "Share on Google+",
-            "summary": "Summary",
-            "solutionsButtonTitle": "Show comments"
-        }
-    }
+def render_slides(content_type, content_data):
+    # Items may carry their own "type" to mix activity types in one
+    # presentation; content_type is the default for untyped items. Padding
+    # to a slide count is done once, in ir.build_presentation.
+    for number, item in enumerate(content_data, 1):
+        yield template_for(item.get("type", content_type)).render(item, number)
+
+def write_slides_json(stream, slides):
+    # Writes content.json from already rendered slide JSON strings, one at a
+    # time, so memory stays flat however many slides the presentation has.
+    prefix, suffix = PRESENTATION_TEMPLATE.parts
+    stream.write(prefix.encode("utf-8") + b"[")
+    for i, slide in enumerate(slides):
+        stream.write((", " + slide if i else slide).encode("utf-8"))
+    stream.write(b"]" + suffix.encode("utf-8"))
+
+def write_content_json(stream, content_type, content_data):
+    write_slides_json(stream, render_slides(content_type, content_data))
+
+def render_content_json(content_type, content_data):
+    stream = io.BytesIO()
+    write_content_json(stream, content_type, content_data)
+    return stream.getvalue().decode("utf-8")
+
+# Entries carry a fixed timestamp so identical content gives identical bytes.
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+def zip_entry(name):
+    return zipfile.ZipInfo(name, ZIP_DATE)
+
+def build_h5p_package(pdf_name, content_type, content_data, fileobj=None):
+    # Serializes both JSON documents straight into the zip, so concurrent
+    # builds never share a scratch directory on disk. content_data may be
+    # any iterable of items and is consumed once.
+    target = fileobj if fileobj is not None else io.BytesIO()
+    with metrics.span("h5p_zip"), zipfile.ZipFile(target, "w") as h5p_zip:
+        h5p_zip.writestr(zip_entry("h5p.json"), json.dumps(build_h5p_data(pdf_name)))
+        with h5p_zip.open(zip_entry("content/content.json"), "w") as entry:
+            write_content_json(entry, content_type, content_data)
+    if fileobj is None:
+        return target.getvalue()
+    return fileobj
 
-    os.makedirs("temp_h5p/content", exist_ok=True)
-    with open("temp_h5p/h5p.json", "w") as f:
-        json.dump(h5p_data, f)
-    with open("temp_h5p/content/content.json", "w") as f:
-        json.dump(content_data_json, f)
+def create_h5p_course_presentation(pdf_name, content_type, content_data, output_filename="output.h5p", output_dir=None):
+    output_filename = os.path.join(output_dir or "", output_filename.replace("/", "-"))
+    md_filename = os.path.join(output_dir or "", f"{pdf_name}_{content_type.replace('/', '-')}_Questions.md")
 
-    with zipfile.ZipFile(output_filename, "w") as h5p_zip:
-        h5p_zip.write("temp_h5p/h5p.json", "h5p.json")
-        h5p_zip.write("temp_h5p/content/content.json", "content/content.json")
+    # The Markdown file is written alongside the package in the same pass,
+    # so a streamed content_data is only iterated once.
+    with open(output_filename, "wb") as f, open(md_filename, "w", encoding="utf-8") as md:
+        md.write(markdown_header(content_type))
 
-    md_filename = f"{pdf_name}_{content_type.replace('/', '-')}_Questions.md"
-    md_file = generate_markdown(content_data, content_type, md_filename)
+        def with_markdown(items):
+            for i, item in enumerate(items, 1):
+                md.write(markdown_for_item(item, i, content_type))
+                yield item
 
-    os.remove("temp_h5p/h5p.json")
-    os.remove("temp_h5p/content/content.json")
-    os.rmdir("temp_h5p/content")
-    os.rmdir("temp_h5p")
+        build_h5p_package(pdf_name, content_type, with_markdown(content_data), f)
 
-    return output_filename, md_file
+    return output_filename, md_filename
@@ -0,0 +1,145 @@
+# incremental.py
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import zipfile
+
+import metrics
+from exporters import WRITERS, export_files
+from h5p_builder import write_slides_json, zip_entry
+from ir import build_presentation
+from llm import agenerate_questions
+from providers import API_KEY_VARS, PROVIDERS, get_provider, run
+from selection import item_key
+from slide_templates import CONTENT_TYPES, template_for
+
+# A slide manifest sits next to each package (<name>.slides.json). It keeps
+# every slide's item and rendered JSON plus the source text each slide was
+# generated from, so one slide can be regenerated and spliced back in
+# without touching the others.
+CONTENT_JSON = "content/content.json"
+MANIFEST_VERSION = 1
+
+def manifest_path(h5p_path):
+    return os.path.splitext(h5p_path)[0] + ".slides.json"
+
+def _slide_entry(number, slide_type, item):
+    rendered = template_for(slide_type).render(item, number)
+    return {
+        "number": number,
+        "type": slide_type,
+        "hash": hashlib.sha256(rendered.encode("utf-8")).hexdigest(),
+        "source": "{}-{}".format(*item["pages"]) if item.get("pages") else None,
+        "item": item,
+        "json": rendered
+    }
+
+def build_manifest(pdf_name, content_type, content_data, chunks, leading_prompt):
+    # chunks are the generation chunks; only the ones slides came from are
+    # kept, keyed by their 0-based page range.
+    texts = {f"{c['first_page']}-{c['last_page']}": c["text"] for c in chunks}
+    slides = [_slide_entry(number, item.get("type", content_type), item) for number, item in enumerate(content_data, 1)]
+    return {
+        "version": MANIFEST_VERSION,
+        "pdf_name": pdf_name,
+        "content_type": content_type,
+        "leading_prompt": leading_prompt,
+        "sources": {s["source"]: texts[s["source"]] for s in slides if s["source"] in texts},
+        "slides": slides
+    }
+
+def manifest_items(manifest):
+    return [slide["item"] for slide in manifest["slides"]]
+
+def load_manifest(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+def patch_package(source, target, manifest):
+    # Writes a copy of the package with content.json spliced from the
+    # manifest's slide JSON; every other entry is copied unchanged, with its
+    # name, date and compression.
+    with metrics.span("h5p_patch"), zipfile.ZipFile(source) as old, zipfile.ZipFile(target, "w") as new:
+        for info in old.infolist():
+            if info.filename == CONTENT_JSON:
+                with new.open(zip_entry(CONTENT_JSON), "w") as entry:
+                    write_slides_json(entry, (s["json"] for s in manifest["slides"]))
+                continue
+            copy = zipfile.ZipInfo(info.filename, info.date_time)
+            copy.compress_type = info.compress_type
+            copy.external_attr = info.external_attr
+            copy.file_size = info.file_size
+            with old.open(info) as src, new.open(copy, "w") as dst:
+                shutil.copyfileobj(src, dst)
+
+async def aregenerate_item(manifest, number, provider, leading_prompt=None, content_type=None):
+    # Asks the model for one new item for slide `number` (1-based) from the
+    # text that slide came from, and updates only that slide in manifest.
+    if not 1 <= number <= len(manifest["slides"]):
+        raise ValueError(f"Slide {number} is out of range (1-{len(manifest['slides'])}).")
+    slide = manifest["slides"][number - 1]
+    text = manifest["sources"].get(slide["source"])
+    if text is None:
+        raise ValueError(f"Slide {number} has no stored source text to regenerate from.")
+    slide_type = content_type or slide["type"]
+    old = {key: value for key, value in slide["item"].items() if key not in ("type", "pages")}
+    prompt = f"{leading_prompt or manifest['leading_prompt']}\n\nDo not repeat this existing item: {json.dumps(old)}"
+    with metrics.span("regenerate", slide=number, content_type=slide_type):
+        items = await agenerate_questions(provider, text, slide_type, prompt, cache=None, count=1)
+    item = next((i for i in items if item_key(i) != item_key(old)), items[0])
+    item = dict(item, type=slide_type, pages=slide["item"].get("pages"))
+    manifest["slides"][number - 1] = _slide_entry(number, slide_type, item)
+    return item
+
+def refresh_exports(manifest, h5p_path):
+    # Rewrites the other export formats already present next to the package
+    # from the manifest items (no model calls).
+    presentation = build_presentation(manifest["pdf_name"], manifest["content_type"], manifest_items(manifest))
+    output_dir = os.path.dirname(h5p_path)
+    formats = [name for name, writer in WRITERS.items() if name != "h5p" and os.path.exists(os.path.join(output_dir, writer.filename(presentation)))]
+    return export_files(presentation, formats, output_dir)
+
+async def aregenerate_slide(h5p_path, number, provider, leading_prompt=None, content_type=None):
+    path = manifest_path(h5p_path)
+    manifest = load_manifest(path)
+    item = await aregenerate_item(manifest, number, provider, leading_prompt, content_type)
+    tmp_path = h5p_path + ".tmp"
+    patch_package(h5p_path, tmp_path, manifest)
+    os.replace(tmp_path, h5p_path)
+    save_manifest(manifest, path)
+    refresh_exports(manifest, h5p_path)
+    return item
+
+def regenerate_slide(h5p_path, number, provider, leading_prompt=None, content_type=None):
+    return run(aregenerate_slide(h5p_path, number, provider, leading_prompt, content_type))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate one slide of a generated H5P presentation.")
+    parser.add_argument("package", help="Path to the .h5p file (its .slides.json manifest must sit next to it)")
+    parser.add_argument("slide", type=int, help="Slide number, starting at 1")
+    parser.add_argument("--provider", choices=list(PROVIDERS), default="Groq")
+    parser.add_argument("--api-key", help="API key (defaults to the provider's environment variable)")
+    parser.add_argument("--type", dest="content_type", choices=list(CONTENT_TYPES), help="Change the slide's activity type")
+    parser.add_argument("--prompt", help="Leading prompt (defaults to the one the presentation was generated with)")
+    args = parser.parse_args(argv)
+
+    api_key = args.api_key or os.environ.get(API_KEY_VARS[args.provider])
+    if not api_key:
+        parser.error(f"no API key: pass --api-key or set {API_KEY_VARS[args.provider]}")
+    if not os.path.exists(manifest_path(args.package)):
+        parser.error(f"no slide manifest at {manifest_path(args.package)}")
+    item = regenerate_slide(args.package, args.slide, get_provider(args.provider, api_key), args.prompt, args.content_type)
+    print(json.dumps(item, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# ir.py
+from dataclasses import dataclass
+
+from slide_templates import CONTENT_TYPES, template_for, true_false_value
+
+# Typed, compact slides built once from the generated items; every export
+# format is written from these instead of the raw dicts. __slots__ is
+# declared by hand because dataclass(slots=True) needs Python 3.10 and the
+# app supports 3.9.
+
+def slide_type(cls):
+    # Attaches the class to its content type's template.
+    template_for(cls.content_type).slide_class = cls
+    return cls
+
+@slide_type
+@dataclass
+class MultipleChoice:
+    __slots__ = ("question", "options", "correct")
+    question: str
+    options: tuple
+    correct: str
+    content_type = "Multiple Choice"
+
+    @classmethod
+    def from_item(cls, item):
+        return cls(str(item["question"]), tuple(str(o) for o in item["options"]), str(item["correct"]))
+
+    def as_item(self):
+        return {"type": self.content_type, "question": self.question, "options": list(self.options), "correct": self.correct}
+
+@slide_type
+@dataclass
+class FillInTheBlanks:
+    __slots__ = ("text", "answer")
+    text: str
+    answer: str
+    content_type = "Fill in the Blanks"
+
+    @classmethod
+    def from_item(cls, item):
+        return cls(str(item["text"]), str(item["answer"]))
+
+    def as_item(self):
+        return {"type": self.content_type, "text": self.text, "answer": self.answer}
+
+@slide_type
+@dataclass
+class TrueFalse:
+    __slots__ = ("question", "correct")
+    question: str
+    correct: bool
+    content_type = "True/False"
+
+    @classmethod
+    def from_item(cls, item):
+        return cls(str(item["question"]), bool(true_false_value(item["correct"])))
+
+    def as_item(self):
+        return {"type": self.content_type, "question": self.question, "correct": self.correct}
+
+@slide_type
+@dataclass
+class TextSlide:
+    __slots__ = ("outline", "notes")
+    outline: str
+    notes: str
+    content_type = "Text"
+
+    @classmethod
+    def from_item(cls, item):
+        return cls(str(item.get("outline", item.get("text", "No outline provided."))), str(item.get("notes", "No speaker notes provided.")))
+
+    def as_item(self):
+        return {"type": self.content_type, "outline": self.outline, "notes": self.notes}
+
+@dataclass
+class Presentation:
+    __slots__ = ("name", "content_type", "slides")
+    name: str
+    content_type: str
+    slides: list
+
+    def items(self):
+        return [slide.as_item() for slide in self.slides]
+
+def build_presentation(name, content_type, content_data, slide_count=None):
+    # Items may carry their own "type" (mixed presentations); content_type is
+    # the default. With slide_count, the list is cut or padded with each
+    # template's placeholder to exactly that many slides.
+    slides = []
+    for item in content_data:
+        if slide_count is not None and len(slides) >= slide_count:
+            break
+        slides.append(template_for(item.get("type", content_type)).slide_class.from_item(item))
+    if slide_count is not None and len(slides) < slide_count:
+        pad_type = content_type if content_type in CONTENT_TYPES else (slides[-1].content_type if slides else "Text")
+        template = template_for(pad_type)
+        for number in range(len(slides) + 1, slide_count + 1):
+            slides.append(template.slide_class.from_item(template.placeholder(number)))
+    return Presentation(name, content_type, slides)
@@ -0,0 +1,333 @@
+# jobs.py
+import asyncio
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import metrics
+from generation import agenerate_mixed, pages_covered
+from exporters import DEFAULT_FORMATS, WRITERS, export_bytes, writer_for
+from incremental import aregenerate_item, build_manifest, manifest_items, patch_package
+from ir import build_presentation
+from llm import agenerate_questions
+from pdf_extract import iter_pages
+from providers import get_loop
+from tokens import chunk_budget, counter_for
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+MAX_WORKERS = 2
+MAX_AGE = 7 * 24 * 3600
+# Progress events are written in batches at most this often.
+PROGRESS_INTERVAL = 0.5
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        import ctypes
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class JobStore:
+    # Persistent job table plus progress events and artifacts, shared by the
+    # UI (polling) and the workers (writing) through one WAL connection.
+    def __init__(self, path="jobs.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute('''CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT, params TEXT, progress REAL, message TEXT, error TEXT, created REAL, updated REAL)''')
+                conn.execute('''CREATE TABLE IF NOT EXISTS job_events (id INTEGER PRIMARY KEY, job_id TEXT, created REAL, progress REAL, message TEXT, data TEXT)''')
+                conn.execute('''CREATE TABLE IF NOT EXISTS job_artifacts (job_id TEXT, name TEXT, mime TEXT, data BLOB, PRIMARY KEY (job_id, name))''')
+                conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id)")
+                # owner is the pid of the process running the job (added after
+                # the first release, hence the migration).
+                if "owner" not in [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+            self._conn = conn
+        return self._conn
+
+    def _write(self, sql, args):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(sql, args)
+
+    def _read(self, sql, args):
+        with self._lock:
+            return self._connect().execute(sql, args).fetchall()
+
+    def create(self, job_id, params):
+        now = time.time()
+        self._write("INSERT INTO jobs (id, status, params, progress, message, error, created, updated, owner) VALUES (?, ?, ?, 0, 'Queued', NULL, ?, ?, ?)", (job_id, QUEUED, json.dumps(params), now, now, os.getpid()))
+
+    def set_status(self, job_id, status, message=None, error=None):
+        self._write("UPDATE jobs SET status = ?, message = COALESCE(?, message), error = ?, updated = ? WHERE id = ?", (status, message, error, time.time(), job_id))
+
+    def add_event(self, job_id, progress, message, data=None):
+        self.add_events(job_id, [(time.time(), progress, message, data)])
+
+    def add_events(self, job_id, events):
+        # events are (created, progress, message, data) tuples, written in
+        # one transaction; the job shows the last one.
+        if not events:
+            return
+        created, progress, message, _ = events[-1]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT INTO job_events (job_id, created, progress, message, data) VALUES (?, ?, ?, ?, ?)", [(job_id, c, p, m, None if d is None else json.dumps(d)) for c, p, m, d in events])
+                conn.execute("UPDATE jobs SET progress = ?, message = ?, updated = ? WHERE id = ?", (progress, message, created, job_id))
+
+    def get(self, job_id):
+        rows = self._read("SELECT id, status, params, progress, message, error, created, updated FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        job_id, status, params, progress, message, error, created, updated = rows[0]
+        return {"id": job_id, "status": status, "params": json.loads(params), "progress": progress, "message": message, "error": error, "created": created, "updated": updated}
+
+    def recent(self, limit=10):
+        rows = self._read("SELECT id FROM jobs ORDER BY created DESC LIMIT ?", (limit,))
+        return [self.get(row[0]) for row in rows]
+
+    def events(self, job_id, after=0):
+        rows = self._read("SELECT id, created, progress, message, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id", (job_id, after))
+        return [{"id": i, "created": c, "progress": p, "message": m, "data": None if d is None else json.loads(d)} for i, c, p, m, d in rows]
+
+    def put_artifact(self, job_id, name, data, mime="application/octet-stream"):
+        self._write("INSERT OR REPLACE INTO job_artifacts (job_id, name, mime, data) VALUES (?, ?, ?, ?)", (job_id, name, mime, data))
+
+    def artifacts(self, job_id):
+        return self._read("SELECT name, mime FROM job_artifacts WHERE job_id = ? ORDER BY rowid", (job_id,))
+
+    def artifact(self, job_id, name):
+        rows = self._read("SELECT data FROM job_artifacts WHERE job_id = ? AND name = ?", (job_id, name))
+        return rows[0][0] if rows else None
+
+    def recover(self, max_age=MAX_AGE):
+        # Jobs cut off by a server restart cannot resume without the API key
+        # (which is never persisted), so unfinished jobs whose process is
+        # gone are marked failed; jobs of other live processes (a second
+        # Streamlit server) are left alone. Old jobs are pruned.
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                unfinished = conn.execute("SELECT id, owner FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+                lost = [(FAILED, now, job_id) for job_id, owner in unfinished if owner is None or (owner != os.getpid() and not _pid_alive(owner))]
+                conn.executemany("UPDATE jobs SET status = ?, error = 'Interrupted by a server restart', updated = ? WHERE id = ?", lost)
+                old = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE created < ?", (now - max_age,))]
+                for table, column in (("job_events", "job_id"), ("job_artifacts", "job_id"), ("jobs", "id")):
+                    conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(job_id,) for job_id in old])
+
+class Job:
+    def __init__(self, job_id, params, context, store):
+        self.id = job_id
+        self.params = params
+        self.context = context
+        self.store = store
+        self._events = []
+        self._flushing = None
+
+    def progress(self, fraction, message, data=None):
+        # Called on the provider event loop (e.g. once per streamed item), so
+        # events are buffered and committed from a worker thread instead of
+        # stalling the streams sharing the loop.
+        self._events.append((time.time(), fraction, message, data))
+        if self._flushing is None:
+            self._flushing = asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        while self._events:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            events, self._events = self._events, []
+            await asyncio.to_thread(self.store.add_events, self.id, events)
+        self._flushing = None
+
+    async def drain(self):
+        # Waits until every progress event has been written.
+        if self._flushing is not None:
+            await asyncio.gather(self._flushing, return_exceptions=True)
+
+    def input(self, name):
+        return self.store.artifact(self.id, name)
+
+    def put_artifact(self, name, data, mime="application/octet-stream"):
+        self.store.put_artifact(self.id, name, data, mime)
+
+class JobQueue:
+    # Jobs run on the provider event loop in its side thread, so they outlive
+    # Streamlit reruns; at most `workers` jobs run at once and the rest wait
+    # in the queued state. context holds in-memory objects (e.g. the
+    # provider with its API key) that are never written to the database.
+    def __init__(self, store, runner, workers=MAX_WORKERS):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self._semaphore = None
+        store.recover()
+
+    def submit(self, params, context=None, inputs=None, runner=None):
+        # runner defaults to the queue's; other operations on finished jobs
+        # (see regenerate_job) pass their own.
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, params)
+        for name, (data, mime) in (inputs or {}).items():
+            self.store.put_artifact(job_id, name, data, mime)
+        asyncio.run_coroutine_threadsafe(self._run(Job(job_id, params, context, self.store), runner or self.runner), get_loop())
+        return job_id
+
+    async def _run(self, job, runner):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        async with self._semaphore:
+            self.store.set_status(job.id, RUNNING, "Started")
+            with metrics.run(job.id) as run:
+                try:
+                    await runner(job)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                else:
+                    error = None
+                await job.drain()
+            self.store.put_artifact(job.id, "metrics.json", json.dumps(run.summary()).encode("utf-8"), "application/json")
+            if error:
+                self.store.set_status(job.id, FAILED, "Failed", error)
+            else:
+                self.store.set_status(job.id, DONE, "Done")
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+def _content_type(params):
+    content_types = params["content_types"]
+    return content_types[0] if len(content_types) == 1 else "Mixed"
+
+async def generate_presentation(job):
+    params = job.params
+    provider = job.context["provider"]
+    content_type = _content_type(params)
+    slide_count = params["slide_count"]
+
+    job.progress(0.0, "Extracting text")
+    pdf_data = job.input("input.pdf")
+    with metrics.span("extract"):
+        pages = await asyncio.to_thread(lambda: list(iter_pages(pdf_data)))
+    if not any(text.strip() for _, text in pages):
+        raise ValueError("Failed to extract text from PDF.")
+
+    received = [0]
+
+    def on_item(item):
+        received[0] += 1
+        job.progress(0.1 + 0.8 * min(received[0] / slide_count, 1.0), f"Received {received[0]} items", item)
+
+    job.progress(0.1, "Generating content")
+    content, chunks, errors = await agenerate_mixed(
+        lambda text, t: agenerate_questions(provider, text, t, params["leading_prompt"], on_item=on_item),
+        pages,
+        params["content_types"],
+        n=slide_count,
+        chunk_tokens=chunk_budget(provider),
+        concurrency=params["concurrency"],
+        max_chunks=params["concurrency"] * 2,
+        counter=counter_for(provider)
+    )
+    if not content:
+        raise ValueError("No content was generated.")
+    job.progress(0.9, f"Generated {len(content)} items from {len(chunks)} chunks", {
+        "chunks": len(chunks),
+        "failed_chunks": len(errors),
+        "pages_used": pages_covered(chunks),
+        "pages_total": len(pages),
+        "first_page": chunks[0]["first_page"] + 1,
+        "last_page": chunks[-1]["last_page"] + 1,
+        "errors": [str(e) for e in errors[:3]]
+    })
+
+    # content.json is kept so other formats can be exported later without
+    # generating again (see export_artifact).
+    job.put_artifact("content.json", json.dumps(content).encode("utf-8"), "application/json")
+    manifest = build_manifest(params["pdf_name"], content_type, content, chunks, params["leading_prompt"])
+    job.put_artifact("slides.json", json.dumps(manifest).encode("utf-8"), "application/json")
+    presentation = build_presentation(params["pdf_name"], content_type, content)
+    for name in params.get("formats", DEFAULT_FORMATS):
+        writer = writer_for(name)
+        data = await asyncio.to_thread(export_bytes, presentation, name)
+        job.put_artifact(writer.filename(presentation), data, writer.mime)
+    job.progress(1.0, "Packaged")
+
+def export_artifact(store, job_id, name):
+    # Writes one more format for a finished job from its stored items and
+    # returns the artifact name.
+    job = store.get(job_id)
+    content = json.loads(store.artifact(job_id, "content.json") or "[]")
+    presentation = build_presentation(job["params"]["pdf_name"], _content_type(job["params"]), content)
+    writer = writer_for(name)
+    filename = writer.filename(presentation)
+    store.put_artifact(job_id, filename, export_bytes(presentation, name), writer.mime)
+    return filename
+
+_regenerate_locks = {}
+
+def _store_regenerated(store, job_id, manifest):
+    content = manifest_items(manifest)
+    store.put_artifact(job_id, "slides.json", json.dumps(manifest).encode("utf-8"), "application/json")
+    store.put_artifact(job_id, "content.json", json.dumps(content).encode("utf-8"), "application/json")
+    job = store.get(job_id)
+    presentation = build_presentation(job["params"]["pdf_name"], _content_type(job["params"]), content)
+    filenames = {writer.filename(presentation): writer for writer in WRITERS.values()}
+    for name, mime in store.artifacts(job_id):
+        writer = filenames.get(name)
+        if writer is None:
+            continue
+        if writer.name == "h5p":
+            patched = io.BytesIO()
+            patch_package(io.BytesIO(store.artifact(job_id, name)), patched, manifest)
+            data = patched.getvalue()
+        else:
+            data = export_bytes(presentation, writer.name)
+        store.put_artifact(job_id, name, data, mime)
+
+async def regenerate_slide(store, job_id, number, provider):
+    # Regenerates one slide of a finished job with a single model call. The
+    # package is patched in place of a rebuild and the job's other formats
+    # are re-exported from the updated items, off the event loop.
+    # Regenerations of the same job run one at a time.
+    async with _regenerate_locks.setdefault(job_id, asyncio.Lock()):
+        manifest = json.loads(store.artifact(job_id, "slides.json"))
+        item = await aregenerate_item(manifest, number, provider)
+        await asyncio.to_thread(_store_regenerated, store, job_id, manifest)
+    return item
+
+async def regenerate_job(job):
+    # Runner for a regenerate-slide job; params name the finished job and
+    # the slide, and the new item is kept as item.json.
+    params = job.params
+    job.progress(0.0, f"Regenerating slide {params['slide']}")
+    item = await regenerate_slide(job.store, params["job_id"], params["slide"], job.context["provider"])
+    job.put_artifact("item.json", json.dumps(item).encode("utf-8"), "application/json")
+    job.progress(1.0, "Regenerated")
+
+job_queue = JobQueue(JobStore(), generate_presentation)
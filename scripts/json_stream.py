@@ -0,0 +1,109 @@
+# json_stream.py
+import json
+
+class JSONArrayItemParser:
+    # Incremental parser for a JSON array of objects arriving in pieces.
+    # feed() returns every object whose closing brace has arrived. Text before
+    # the array (preambles, code fences) is skipped: parsing starts at a "["
+    # followed by "{" or "]", and an array that closes without any object
+    # (e.g. "see [] below") is skipped too. An object that fails to parse is
+    # recorded in errors instead of discarding the items around it.
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.started = False
+        self.finished = False
+        self.depth = 0
+        self.objects = 0
+        self.in_string = False
+        self.escape = False
+        self.item_start = None
+        self.errors = []
+        self._reported = 0
+
+    def feed(self, text):
+        items = []
+        if self.finished:
+            return items
+        self.buffer += text
+        buffer = self.buffer
+        i = self.pos
+        while i < len(buffer):
+            if not self.started:
+                i = buffer.find("[", i)
+                if i < 0:
+                    i = len(buffer)
+                    break
+                j = i + 1
+                while j < len(buffer) and buffer[j].isspace():
+                    j += 1
+                if j == len(buffer):
+                    # Wait for the character that decides whether this "["
+                    # opens the array.
+                    break
+                if buffer[j] not in "{]":
+                    i += 1
+                    continue
+                self.started = True
+                self.depth = 1
+                self.objects = 0
+                i += 1
+                continue
+            ch = buffer[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                if self.depth == 1 and ch == "{":
+                    self.item_start = i
+                    self.objects += 1
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 1 and ch == "}" and self.item_start is not None:
+                    raw = buffer[self.item_start:i + 1]
+                    self.item_start = None
+                    try:
+                        items.append(json.loads(raw))
+                    except ValueError as e:
+                        self.errors.append(e)
+                elif self.depth == 0:
+                    i += 1
+                    if self.objects:
+                        self.finished = True
+                        break
+                    # An empty array in the preamble; keep looking.
+                    self.started = False
+                    continue
+            i += 1
+        # Drop everything already consumed that no open item still needs.
+        keep = self.item_start if self.item_start is not None else i
+        self.buffer = buffer[keep:]
+        if self.item_start is not None:
+            self.item_start = 0
+        self.pos = i - keep
+        return items
+
+    def new_errors(self):
+        # Errors recorded since the last call, for callers that report them
+        # as they stream.
+        errors = self.errors[self._reported:]
+        self._reported = len(self.errors)
+        return errors
+
+def iter_json_items(chunks):
+    parser = JSONArrayItemParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+
+async def aiter_json_items(chunks, parser=None):
+    parser = parser or JSONArrayItemParser()
+    async for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield item
@@ -0,0 +1,134 @@
+# llm.py
+import time
+import metrics
+from json_stream import JSONArrayItemParser
+from providers import SAMPLING, ProviderError, run
+from response_cache import response_cache
+from schemas import build_repair_prompt, validate_item
+from tokens import counter_for
+
+# Rounds of re-asking for items that failed validation.
+REPAIR_ROUNDS = 2
+
+def build_prompt(pdf_text, content_type, leading_prompt, count=10):
+    json_instruction = f"Ensure the response is a valid JSON list of {count} objects, strictly formatted as requested, with no additional text."
+    if content_type == "Multiple Choice":
+        base_prompt = (
+            f"{leading_prompt}\n\n{json_instruction}\n\nFrom the following text, generate {count} multiple-choice questions, each with 4 options and one correct answer. "
+            f"Return the result as a JSON list of objects with 'question', 'options', and 'correct' keys.\n\nText:\n{pdf_text}"
+        )
+    elif content_type == "Fill in the Blanks":
+        base_prompt = (
+            f"{leading_prompt}\n\n{json_instruction}\n\nFrom the following text, generate {count} fill-in-the-blanks sentences, each with one blank and its answer. "
+            f"Return the result as a JSON list of objects with 'text' and 'answer' keys.\n\nText:\n{pdf_text}"
+        )
+    elif content_type == "True/False":
+        base_prompt = (
+            f"{leading_prompt}\n\n{json_instruction}\n\nFrom the following text, generate {count} true/false statements, each with a question and a correct answer (True or False). "
+            f"Return the result as a JSON list of objects with 'question' and 'correct' keys.\n\nText:\n{pdf_text}"
+        )
+    elif content_type == "Text":
+        base_prompt = (
+            f"{leading_prompt}\n\n{json_instruction}\n\nFrom the following text, generate {count} concise text snippets for presentation slides, each summarizing a key point. "
+            f"Return the result as a JSON list of objects with 'outline' and 'notes' keys.\n\nText:\n{pdf_text}"
+        )
+    return base_prompt
+
+def _check(items, parser, content_type, invalid):
+    # Yields the valid (normalized) items; the rest, and objects that were not
+    # valid JSON, go to invalid with their problems.
+    for item in items:
+        item, problems = validate_item(item, content_type)
+        if problems:
+            invalid.append((item, problems))
+        else:
+            yield item
+    for error in parser.new_errors():
+        invalid.append((getattr(error, "doc", ""), [f"not valid JSON ({error})"]))
+
+async def astream_questions(provider, pdf_text, content_type, leading_prompt, cache=response_cache, invalid=None, count=10):
+    # Yields each valid item as soon as its closing brace arrives; invalid
+    # items are appended to invalid for repair. The raw reply is cached only
+    # when the whole array arrived and every item parsed and validated.
+    invalid = [] if invalid is None else invalid
+    with metrics.span("prompt_build", content_type=content_type):
+        base_prompt = build_prompt(pdf_text, content_type, leading_prompt, count)
+        key = cache.key(provider.name, provider.model, base_prompt, SAMPLING) if cache is not None else None
+    raw = cache.get(key) if key else None
+    if raw is not None:
+        parser = JSONArrayItemParser()
+        with metrics.span("json_parse", cached=True):
+            items = list(_check(parser.feed(raw), parser, content_type, invalid))
+        for item in items:
+            yield item
+        return
+    parser = JSONArrayItemParser()
+    invalid_before = len(invalid)
+    counter = counter_for(provider)
+    pieces = []
+    parse_seconds = 0.0
+    metrics.incr("tokens_in", counter.count(base_prompt))
+    metrics.incr("request_bytes", len(base_prompt.encode("utf-8")))
+    # Parsing is interleaved with the stream, so its time is summed
+    # separately from the provider call.
+    with metrics.span("provider_call", provider=provider.name, model=provider.model, content_type=content_type):
+        async for text in provider.stream(base_prompt, sampling=SAMPLING):
+            pieces.append(text)
+            start = time.perf_counter()
+            items = list(_check(parser.feed(text), parser, content_type, invalid))
+            parse_seconds += time.perf_counter() - start
+            for item in items:
+                yield item
+    metrics.record("json_parse", parse_seconds, cached=False)
+    raw = "".join(pieces)
+    metrics.incr("tokens_out", counter.count(raw))
+    metrics.incr("response_bytes", len(raw.encode("utf-8")))
+    if key and parser.finished and not parser.errors and len(invalid) == invalid_before:
+        cache.put(key, raw)
+
+async def arepair_items(provider, content_type, invalid):
+    # Sends only the invalid items back with their problems and returns the
+    # ones that come back valid.
+    repaired = []
+    counter = counter_for(provider)
+    for _ in range(REPAIR_ROUNDS):
+        if not invalid:
+            break
+        prompt = build_repair_prompt(content_type, invalid)
+        metrics.incr("items_invalid", len(invalid))
+        metrics.incr("tokens_in", counter.count(prompt))
+        try:
+            with metrics.span("repair", provider=provider.name, content_type=content_type, items=len(invalid)):
+                raw = await provider.complete(prompt, sampling=SAMPLING)
+        except ProviderError:
+            break
+        metrics.incr("tokens_out", counter.count(raw))
+        parser = JSONArrayItemParser()
+        invalid = []
+        repaired.extend(_check(parser.feed(raw), parser, content_type, invalid))
+    metrics.incr("items_repaired", len(repaired))
+    return repaired
+
+async def agenerate_questions(provider, pdf_text, content_type, leading_prompt, cache=response_cache, on_item=None, count=10):
+    # Items received before a cut-off stream are kept rather than discarded.
+    items = []
+    invalid = []
+    try:
+        async for item in astream_questions(provider, pdf_text, content_type, leading_prompt, cache, invalid, count):
+            items.append(item)
+            if on_item is not None:
+                on_item(item)
+    except ProviderError:
+        if not items and not invalid:
+            raise
+    if invalid:
+        for item in await arepair_items(provider, content_type, invalid):
+            items.append(item)
+            if on_item is not None:
+                on_item(item)
+    if not items:
+        raise ValueError(f"{provider.name} reply contained no JSON items")
+    return items
+
+def generate_questions_with_api(provider, pdf_text, content_type, leading_prompt, cache=response_cache):
+    return run(agenerate_questions(provider, pdf_text, content_type, leading_prompt, cache))
@@ -0,0 +1,147 @@
+# metrics.py
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOG_PATH = os.environ.get("H5P_METRICS_LOG", "metrics.jsonl")
+logger = logging.getLogger(__name__)
+
+# Process-wide totals (for the Prometheus endpoint) plus an optional per-run
+# collector carried in a context variable, so spans recorded in asyncio tasks
+# and worker threads started from a run are attributed to it.
+_lock = threading.Lock()
+_span_totals = {}
+_counter_totals = {}
+_log_file = None
+_current_run = contextvars.ContextVar("metrics_run", default=None)
+_server = None
+_server_started = False
+
+class Run:
+    def __init__(self, run_id):
+        self.id = run_id
+        self.started = time.time()
+        self.spans = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, seconds):
+        with self._lock:
+            _accumulate(self.spans, name, seconds)
+
+    def add_counter(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        with self._lock:
+            return {
+                "run": self.id,
+                "seconds": round(time.time() - self.started, 4),
+                "spans": {name: dict(stats, seconds=round(stats["seconds"], 4), max=round(stats["max"], 4)) for name, stats in self.spans.items()},
+                "counters": dict(self.counters)
+            }
+
+def _accumulate(table, name, seconds):
+    stats = table.get(name)
+    if stats is None:
+        stats = table[name] = {"count": 0, "seconds": 0.0, "max": 0.0}
+    stats["count"] += 1
+    stats["seconds"] += seconds
+    stats["max"] = max(stats["max"], seconds)
+
+def _log(record):
+    global _log_file
+    if not LOG_PATH:
+        return
+    line = json.dumps(record, default=str) + "\n"
+    with _lock:
+        if _log_file is None:
+            _log_file = open(LOG_PATH, "a", encoding="utf-8")
+        _log_file.write(line)
+        _log_file.flush()
+
+def record(name, seconds, **attrs):
+    run = _current_run.get()
+    with _lock:
+        _accumulate(_span_totals, name, seconds)
+    if run is not None:
+        run.add_span(name, seconds)
+    _log({"ts": time.time(), "type": "span", "run": run.id if run else None, "span": name, "seconds": round(seconds, 6), **attrs})
+
+def incr(name, value=1):
+    run = _current_run.get()
+    with _lock:
+        _counter_totals[name] = _counter_totals.get(name, 0) + value
+    if run is not None:
+        run.add_counter(name, value)
+
+@contextmanager
+def span(name, **attrs):
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        record(name, time.perf_counter() - start, **attrs)
+
+@contextmanager
+def run(run_id):
+    current = Run(run_id)
+    token = _current_run.set(current)
+    try:
+        yield current
+    finally:
+        _current_run.reset(token)
+        _log({"ts": time.time(), "type": "run", **current.summary()})
+
+def render_prometheus():
+    lines = [
+        "# HELP h5p_stage_seconds Time spent per pipeline stage.",
+        "# TYPE h5p_stage_seconds summary"
+    ]
+    with _lock:
+        spans = {name: dict(stats) for name, stats in _span_totals.items()}
+        counters = dict(_counter_totals)
+    for name, stats in sorted(spans.items()):
+        lines.append(f'h5p_stage_seconds_sum{{stage="{name}"}} {stats["seconds"]:.6f}')
+        lines.append(f'h5p_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+    for name, value in sorted(counters.items()):
+        lines.append(f"# TYPE h5p_{name}_total counter")
+        lines.append(f"h5p_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def serve_metrics(port, host="127.0.0.1"):
+    # Starts the Prometheus text endpoint once per process; safe to call on
+    # every Streamlit rerun. A port that is already taken (e.g. by another
+    # server process) is logged rather than raised, and not retried.
+    global _server, _server_started
+    with _lock:
+        if not _server_started:
+            _server_started = True
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                logger.warning("Metrics endpoint not started on %s:%s: %s", host, port, e)
+            else:
+                threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
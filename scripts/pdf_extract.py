@@ -0,0 +1,131 @@
+# pdf_extract.py
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+
+import metrics
+from tokens import counter_for
+
+PAGES_PER_TASK = 16
+MAX_WORKERS = os.cpu_count() or 1
+MAX_CACHED_DOCUMENTS = 8
+# Extraction pools are started from processes that already run threads (the
+# provider loop, job workers, SQLite connections), where forking can
+# deadlock, so workers come from a fork server (or are spawned where there
+# is none).
+MP_CONTEXT = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Per-page text keyed by the SHA-256 of the PDF bytes, so re-running the same
+# upload (e.g. with another content type) never re-parses the file.
+_page_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+_worker_pdf = None
+
+def _init_worker(data):
+    global _worker_pdf
+    _worker_pdf = pdfplumber.open(io.BytesIO(data))
+
+def _extract_pages(pdf, start, stop):
+    texts = []
+    for page in pdf.pages[start:stop]:
+        texts.append(page.extract_text() or "")
+        page.close()
+    return texts
+
+def _extract_range(start, stop):
+    return _extract_pages(_worker_pdf, start, stop)
+
+def _read_bytes(pdf_file):
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return bytes(pdf_file)
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            return f.read()
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+def _cache_entry(data):
+    digest = hashlib.sha256(data).hexdigest()
+    with _cache_lock:
+        entry = _page_cache.get(digest)
+        if entry is not None:
+            _page_cache.move_to_end(digest)
+            metrics.incr("page_cache_hits")
+            return entry
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        entry = {"page_count": len(pdf.pages), "pages": {}}
+    with _cache_lock:
+        entry = _page_cache.setdefault(digest, entry)
+        while len(_page_cache) > MAX_CACHED_DOCUMENTS:
+            _page_cache.popitem(last=False)
+    return entry
+
+def _iter_ranges(data, pages, ranges, workers):
+    missing = [r for r in ranges if any(p not in pages for p in range(*r))]
+    if not missing:
+        for start, stop in ranges:
+            yield start, [pages[p] for p in range(start, stop)]
+        return
+
+    if workers <= 1 or len(missing) == 1:
+        missing = set(missing)
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            for start, stop in ranges:
+                if (start, stop) in missing:
+                    pages.update(zip(range(start, stop), _extract_pages(pdf, start, stop)))
+                yield start, [pages[p] for p in range(start, stop)]
+        return
+
+    # Each worker opens the document once; tasks only carry page ranges.
+    # A bounded window of in-flight ranges keeps results streaming in order
+    # and lets an early stop cancel everything not yet started.
+    executor = ProcessPoolExecutor(min(workers, len(missing)), mp_context=MP_CONTEXT, initializer=_init_worker, initargs=(data,))
+    try:
+        futures = {}
+        pending = iter(missing)
+
+        def submit_next():
+            r = next(pending, None)
+            if r is not None:
+                futures[r] = executor.submit(_extract_range, *r)
+
+        for _ in range(workers * 2):
+            submit_next()
+        for start, stop in ranges:
+            if (start, stop) in futures:
+                texts = futures.pop((start, stop)).result()
+                pages.update(zip(range(start, stop), texts))
+                submit_next()
+            yield start, [pages[p] for p in range(start, stop)]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_pages(pdf_file, max_tokens=None, workers=MAX_WORKERS, counter=None):
+    # Pages are only counted when max_tokens sets a budget; chunk_pages counts
+    # them again anyway.
+    counter = counter or counter_for()
+    data = _read_bytes(pdf_file)
+    entry = _cache_entry(data)
+    page_count = entry["page_count"]
+    ranges = [(s, min(s + PAGES_PER_TASK, page_count)) for s in range(0, page_count, PAGES_PER_TASK)]
+    tokens = 0
+    for start, texts in _iter_ranges(data, entry["pages"], ranges, workers):
+        metrics.incr("pages_extracted", len(texts))
+        for offset, text in enumerate(texts):
+            yield start + offset, text
+            if max_tokens is not None:
+                tokens += counter.count(text)
+                if tokens > max_tokens:
+                    return
+
+def extract_text_from_pdf(pdf_file, max_tokens=None, workers=MAX_WORKERS, counter=None):
+    return "\n".join(text for _, text in iter_pages(pdf_file, max_tokens, workers, counter))
@@ -0,0 +1,389 @@
+# providers.py
+import asyncio
+import json
+import random
+import threading
+import time
+
+import httpx
+
+import metrics
+
+MODELS = {
+    "Groq": "mixtral-8x7b-32768",
+    "OpenAI": "gpt-4o-mini",
+    "Claude": "claude-3-5-sonnet-20241022",
+    "Google Gemini": "gemini-1.5-flash"
+}
+# Context window (prompt + reply tokens) per model; see tokens.chunk_budget.
+CONTEXT_LIMITS = {
+    "mixtral-8x7b-32768": 32768,
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "claude-3-5-sonnet-20241022": 200000,
+    "claude-3-5-haiku-20241022": 200000,
+    "gemini-1.5-flash": 1048576,
+    "gemini-1.5-pro": 2097152
+}
+DEFAULT_CONTEXT_LIMIT = 8192
+BASE_URLS = {
+    "Groq": "https://api.groq.com/openai/v1",
+    "OpenAI": "https://api.openai.com/v1",
+    "Claude": "https://api.anthropic.com/v1",
+    "Google Gemini": "https://generativelanguage.googleapis.com/v1beta"
+}
+# (requests per second, burst) per API key, sized for the free/entry tiers.
+RATE_LIMITS = {
+    "Groq": (0.5, 5),
+    "OpenAI": (5.0, 10),
+    "Claude": (0.8, 5),
+    "Google Gemini": (0.25, 5)
+}
+# Environment variables the CLIs read API keys from.
+API_KEY_VARS = {
+    "Groq": "GROQ_API_KEY",
+    "OpenAI": "OPENAI_API_KEY",
+    "Claude": "ANTHROPIC_API_KEY",
+    "Google Gemini": "GEMINI_API_KEY"
+}
+SYSTEM_PROMPT = "You are an educational content creator. Follow the provided instructions precisely."
+SAMPLING = {"max_tokens": 2000, "temperature": 0.7}
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+TIMEOUT = 120.0
+
+class ProviderError(Exception):
+    def __init__(self, message, status=None, retryable=False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+# All provider I/O runs on one event loop in a daemon thread, so pooled
+# connections outlive individual Streamlit reruns and can be shared by
+# synchronous callers through run().
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="providers-loop", daemon=True).start()
+        return _loop
+
+def run(coro, timeout=None):
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens=1):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+_clients = {}
+_buckets = {}
+
+def _http_client(base_url, api_key):
+    key = (base_url, api_key)
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        )
+        _clients[key] = client
+    return client
+
+def _bucket(name, api_key):
+    key = (name, api_key)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        rate, capacity = RATE_LIMITS.get(name, (1.0, 5))
+        bucket = _buckets[key] = TokenBucket(rate, capacity)
+    return bucket
+
+def _retry_delay(attempt, response=None):
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX)
+            except ValueError:
+                pass
+    return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.5, 1.5)
+
+class Provider:
+    name = None
+
+    def __init__(self, api_key, model=None, base_url=None, max_retries=MAX_RETRIES):
+        self.api_key = api_key
+        self.model = model or MODELS[self.name]
+        self.base_url = base_url or BASE_URLS[self.name]
+        self.max_retries = max_retries
+
+    def build_request(self, prompt, system, sampling):
+        raise NotImplementedError
+
+    def parse_response(self, data):
+        raise NotImplementedError
+
+    def build_stream_request(self, prompt, system, sampling):
+        path, headers, body = self.build_request(prompt, system, sampling)
+        return path, headers, {**body, "stream": True}
+
+    def parse_stream_event(self, data):
+        raise NotImplementedError
+
+    async def complete(self, prompt, system=SYSTEM_PROMPT, sampling=SAMPLING):
+        path, headers, body = self.build_request(prompt, system, sampling)
+        client = _http_client(self.base_url, self.api_key)
+        bucket = _bucket(self.name, self.api_key)
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                response = await client.post(path, headers=headers, json=body)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise ProviderError(f"{self.name} request failed: {e}", retryable=True) from e
+                metrics.incr("retries")
+                await asyncio.sleep(_retry_delay(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES:
+                if attempt == self.max_retries:
+                    raise ProviderError(f"{self.name} returned {response.status_code} after {attempt + 1} attempts", response.status_code, True)
+                metrics.incr("retries")
+                await asyncio.sleep(_retry_delay(attempt, response))
+                continue
+            if response.status_code >= 400:
+                raise ProviderError(f"{self.name} returned {response.status_code}: {response.text[:200]}", response.status_code)
+            return self.parse_response(response.json())
+
+    async def stream(self, prompt, system=SYSTEM_PROMPT, sampling=SAMPLING):
+        # Yields text deltas from the provider's server-sent events. Failures
+        # are only retried before the first delta, so callers never see text
+        # twice.
+        path, headers, body = self.build_stream_request(prompt, system, sampling)
+        client = _http_client(self.base_url, self.api_key)
+        bucket = _bucket(self.name, self.api_key)
+        started = False
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                async with client.stream("POST", path, headers=headers, json=body) as response:
+                    if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                        delay = _retry_delay(attempt, response)
+                    elif response.status_code >= 400:
+                        await response.aread()
+                        raise ProviderError(f"{self.name} returned {response.status_code}: {response.text[:200]}", response.status_code, response.status_code in RETRY_STATUSES)
+                    else:
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if not data or data == "[DONE]":
+                                continue
+                            try:
+                                text = self.parse_stream_event(json.loads(data))
+                            except ProviderError:
+                                raise
+                            except (ValueError, LookupError, TypeError, AttributeError) as e:
+                                # A garbled event ends the stream like a dropped
+                                # connection, so callers keep what arrived.
+                                raise ProviderError(f"{self.name} sent a malformed stream event: {e}", retryable=True) from e
+                            if text:
+                                started = True
+                                yield text
+                        return
+            except httpx.TransportError as e:
+                if started or attempt == self.max_retries:
+                    raise ProviderError(f"{self.name} stream failed: {e}", retryable=True) from e
+                delay = _retry_delay(attempt)
+            metrics.incr("retries")
+            await asyncio.sleep(delay)
+
+class OpenAIProvider(Provider):
+    name = "OpenAI"
+
+    def build_request(self, prompt, system, sampling):
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        body = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            **sampling
+        }
+        return "/chat/completions", headers, body
+
+    def parse_response(self, data):
+        return data["choices"][0]["message"]["content"]
+
+    def parse_stream_event(self, data):
+        choices = data.get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or ""
+
+class GroqProvider(OpenAIProvider):
+    name = "Groq"
+
+class ClaudeProvider(Provider):
+    name = "Claude"
+
+    def build_request(self, prompt, system, sampling):
+        headers = {"x-api-key": self.api_key, "anthropic-version": "2023-06-01"}
+        body = {
+            "model": self.model,
+            "system": system,
+            "messages": [{"role": "user", "content": prompt}],
+            **sampling
+        }
+        return "/messages", headers, body
+
+    def parse_response(self, data):
+        return "".join(block.get("text", "") for block in data["content"])
+
+    def parse_stream_event(self, data):
+        if data.get("type") == "error":
+            raise ProviderError(f"{self.name} stream error: {data.get('error')}", retryable=True)
+        if data.get("type") == "content_block_delta":
+            return data["delta"].get("text", "")
+        return ""
+
+class GeminiProvider(Provider):
+    name = "Google Gemini"
+
+    def build_request(self, prompt, system, sampling):
+        headers = {"x-goog-api-key": self.api_key}
+        body = {
+            "systemInstruction": {"parts": [{"text": system}]},
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "maxOutputTokens": sampling.get("max_tokens"),
+                "temperature": sampling.get("temperature")
+            }
+        }
+        return f"/models/{self.model}:generateContent", headers, body
+
+    def parse_response(self, data):
+        return "".join(part.get("text", "") for part in data["candidates"][0]["content"]["parts"])
+
+    def build_stream_request(self, prompt, system, sampling):
+        path, headers, body = self.build_request(prompt, system, sampling)
+        return f"/models/{self.model}:streamGenerateContent?alt=sse", headers, body
+
+    def parse_stream_event(self, data):
+        candidates = data.get("candidates") or [{}]
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+PROVIDERS = {
+    "Groq": GroqProvider,
+    "OpenAI": OpenAIProvider,
+    "Claude": ClaudeProvider,
+    "Google Gemini": GeminiProvider
+}
+
+class FallbackProvider:
+    # Tries providers in order. With hedge_after set, the next provider is
+    # also started if the current one has not answered within that many
+    # seconds, and the first successful reply wins.
+    def __init__(self, providers, hedge_after=None):
+        self.providers = providers
+        self.hedge_after = hedge_after
+        self.name = ">".join(p.name for p in providers)
+        self.model = ">".join(p.model for p in providers)
+
+    async def complete(self, prompt, system=SYSTEM_PROMPT, sampling=SAMPLING):
+        pending = set()
+        remaining = list(self.providers)
+        error = None
+        try:
+            while remaining or pending:
+                if remaining and (not pending or self.hedge_after is not None):
+                    pending.add(asyncio.ensure_future(remaining.pop(0).complete(prompt, system, sampling)))
+                timeout = self.hedge_after if remaining else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(self, prompt, system=SYSTEM_PROMPT, sampling=SAMPLING):
+        # Races providers for the first delta the way complete() races for a
+        # reply; the first provider to stream text is kept and the others are
+        # cancelled. There is no fallback after that, so callers never see
+        # text twice.
+        pending = {}
+        remaining = list(self.providers)
+        error = None
+        winner = first = None
+        try:
+            while winner is None and (remaining or pending):
+                if remaining and (not pending or self.hedge_after is not None):
+                    stream = remaining.pop(0).stream(prompt, system, sampling)
+                    pending[asyncio.ensure_future(_first_delta(stream))] = stream
+                timeout = self.hedge_after if remaining else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stream = pending.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner, first = stream, task.result()
+                    else:
+                        await stream.aclose()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for stream in pending.values():
+                await stream.aclose()
+        if winner is None:
+            raise error
+        try:
+            if first is not None:
+                yield first
+                async for text in winner:
+                    yield text
+        finally:
+            await winner.aclose()
+
+async def _first_delta(stream):
+    # The stream's first text delta (None for an empty reply), leaving the
+    # rest of the stream unread.
+    async for text in stream:
+        return text
+    return None
+
+def get_provider(selected_api, api_key, fallback_api=None, fallback_key=None, hedge_after=None):
+    provider = PROVIDERS[selected_api](api_key)
+    if fallback_api and fallback_key:
+        return FallbackProvider([provider, PROVIDERS[fallback_api](fallback_key)], hedge_after)
+    return provider
+
+async def aclose_clients():
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
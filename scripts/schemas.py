@@ -0,0 +1,120 @@
+# schemas.py
+import json
+import re
+
+from slide_templates import template_for, true_false_value
+
+# One schema per content type. check(item) returns the normalized item and a
+# list of problems; an item with problems is sent back to the model for
+# repair instead of reaching the slide templates.
+class Schema:
+    def __init__(self, content_type, keys, check):
+        self.content_type = content_type
+        self.keys = keys
+        self.check = check
+
+    def validate(self, item):
+        if not isinstance(item, dict):
+            return item, ["item is not a JSON object"]
+        item, problems = self.check(dict(item))
+        # A "type" the model made up must not pick the slide template.
+        item["type"] = self.content_type
+        return item, problems
+
+def register(schema):
+    template_for(schema.content_type).schema = schema
+    return schema
+
+def schema_for(content_type):
+    return template_for(content_type).schema
+
+def validate_item(item, content_type):
+    return schema_for(content_type).validate(item)
+
+def _text(item, key, problems):
+    value = item.get(key)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str) or not value.strip():
+        problems.append(f"'{key}' must be a non-empty string")
+        return None
+    item[key] = value.strip()
+    return item[key]
+
+def _check_multiple_choice(item):
+    problems = []
+    _text(item, "question", problems)
+    options = item.get("options")
+    if not isinstance(options, list) or len(options) < 2 or not all(isinstance(o, (str, int, float)) and str(o).strip() for o in options):
+        problems.append("'options' must be a list of at least 2 non-empty strings")
+        return item, problems
+    options = item["options"] = [str(o).strip() for o in options]
+    correct = item.get("correct")
+    # Models often answer with the option letter or index instead of the text.
+    if isinstance(correct, int) and not isinstance(correct, bool) and 0 <= correct < len(options):
+        correct = options[correct]
+    elif isinstance(correct, str):
+        correct = correct.strip()
+        if correct not in options and len(correct) == 1 and "A" <= correct.upper() < chr(ord("A") + len(options)):
+            correct = options[ord(correct.upper()) - ord("A")]
+    if correct not in options:
+        problems.append("'correct' must be exactly one of the options")
+    else:
+        item["correct"] = correct
+    return item, problems
+
+_BLANK_RE = re.compile(r"_{3,}")
+
+def _check_fill_in_the_blanks(item):
+    problems = []
+    text = _text(item, "text", problems)
+    answer = _text(item, "answer", problems)
+    if text:
+        # Exporters split the sentence on exactly four underscores.
+        text = item["text"] = _BLANK_RE.sub("____", text)
+    if text and answer and "____" not in text:
+        # A sentence that still contains its answer can be blanked locally.
+        if answer in text:
+            item["text"] = text.replace(answer, "____", 1)
+        else:
+            problems.append("'text' must contain a blank written as ____")
+    return item, problems
+
+def _check_true_false(item):
+    problems = []
+    _text(item, "question", problems)
+    correct = true_false_value(item.get("correct"))
+    if correct is None:
+        problems.append("'correct' must be true or false")
+    else:
+        item["correct"] = correct
+    return item, problems
+
+def _check_text(item):
+    problems = []
+    # The slide templates read outline/notes; older prompts asked for text.
+    if "outline" not in item and "text" in item:
+        item["outline"] = item.pop("text")
+    _text(item, "outline", problems)
+    notes = item.get("notes")
+    item["notes"] = notes.strip() if isinstance(notes, str) and notes.strip() else "No speaker notes provided."
+    return item, problems
+
+register(Schema("Multiple Choice", "'question', 'options' (4 strings) and 'correct' (the text of the correct option)", _check_multiple_choice))
+register(Schema("Fill in the Blanks", "'text' (a sentence with the blank written as ____) and 'answer'", _check_fill_in_the_blanks))
+register(Schema("True/False", "'question' and 'correct' (true or false)", _check_true_false))
+register(Schema("Text", "'outline' (the key point) and 'notes' (speaker notes)", _check_text))
+
+def build_repair_prompt(content_type, invalid):
+    # invalid is a list of (item or raw text, problems). Only these items are
+    # sent back, so the reply is a fraction of the original batch.
+    schema = schema_for(content_type)
+    lines = []
+    for number, (item, problems) in enumerate(invalid, 1):
+        raw = item if isinstance(item, str) else json.dumps(item, ensure_ascii=False)
+        lines.append(f"{number}. {raw}\n   Problems: {'; '.join(problems)}")
+    return (
+        f"The following {content_type} items are invalid. Correct each one, keeping its meaning, "
+        f"and return a JSON list of exactly {len(invalid)} objects, in the same order, with {schema.keys} keys, "
+        f"with no additional text.\n\n" + "\n".join(lines)
+    )
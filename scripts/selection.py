@@ -0,0 +1,106 @@
+# selection.py
+import itertools
+import re
+import zlib
+
+import numpy as np
+
+# Items are embedded as TF-IDF weighted, hashed word unigrams and bigrams
+# (no fitted vocabulary, no network). Selection is greedy: each pick goes to the
+# next section in a round-robin over the document and takes that section's
+# candidate least similar to everything already picked; candidates too close
+# to a pick form its near-duplicate cluster and are dropped.
+DIMENSIONS = 1024
+DUPLICATE_SIMILARITY = 0.8
+# Exact repeats are never used, even to fill up a short selection.
+EXACT_SIMILARITY = 0.99
+
+_WORD_RE = re.compile(r"\w+")
+
+def item_key(item):
+    text = item.get("question") or item.get("text") or item.get("outline") or ""
+    return " ".join(_WORD_RE.findall(str(text).lower()))
+
+def vectorize(texts):
+    # Returns an (len(texts), DIMENSIONS) float32 matrix of L2-normalized
+    # TF-IDF rows. Each distinct word is hashed once; bigram buckets are
+    # derived from the word hashes with array arithmetic.
+    tokens = [text.split() for text in texts]
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+    words = list(itertools.chain.from_iterable(tokens))
+    vocabulary = {word: i for i, word in enumerate(dict.fromkeys(words))}
+    ids = np.fromiter(map(vocabulary.__getitem__, words), dtype=np.int64, count=len(words))
+    word_hashes = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in vocabulary), dtype=np.int64, count=len(vocabulary))
+    hashes = word_hashes[ids]
+    rows = np.repeat(np.arange(len(texts)), lengths)
+    same_row = rows[1:] == rows[:-1]
+    bigrams = (hashes[:-1] * 1000003 + hashes[1:])[same_row]
+    cells = np.concatenate((rows * DIMENSIONS + hashes % DIMENSIONS, rows[1:][same_row] * DIMENSIONS + bigrams % DIMENSIONS))
+    cells, counts = np.unique(cells, return_counts=True)
+    # Weights and norms are computed on the non-zero cells only.
+    cell_rows, cell_cols = np.divmod(cells, DIMENSIONS)
+    df = np.bincount(cell_cols, minlength=DIMENSIONS)
+    weights = counts * (np.log((1 + len(texts)) / (1 + df)) + 1)[cell_cols]
+    norms = np.sqrt(np.bincount(cell_rows, weights=weights * weights, minlength=len(texts)))
+    matrix = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+    matrix.flat[cells] = weights / norms[cell_rows]
+    return matrix
+
+def select_items(chunk_items, n=10):
+    # chunk_items holds one list of items per chunk, in document order.
+    items, sections = [], []
+    for section, chunk in enumerate(chunk_items):
+        for item in chunk or []:
+            if isinstance(item, dict):
+                items.append(item)
+                sections.append(section)
+    if not items or n <= 0:
+        return []
+    keys = [item_key(item) for item in items]
+    vectors = vectorize(keys)
+    sections = np.asarray(sections)
+    # Empty keys carry no text to compare, so they never count as duplicates.
+    has_text = np.fromiter(map(bool, keys), dtype=bool, count=len(keys))
+    max_similarity = np.zeros(len(items), dtype=np.float32)
+    available = np.ones(len(items), dtype=bool)
+    picked = []
+
+    def take(batch, threshold):
+        # Accepts the batch in order, skipping members within threshold of
+        # an earlier accepted member, then updates every candidate's
+        # similarity to the picks with one matrix product.
+        similarity = vectors[batch] @ vectors[batch].T
+        accepted = []
+        for j, index in enumerate(batch):
+            if has_text[index] and accepted and similarity[j, accepted].max() >= threshold:
+                continue
+            accepted.append(j)
+        chosen = batch[accepted]
+        picked.extend(chosen.tolist())
+        available[chosen] = False
+        chosen = chosen[has_text[chosen]]
+        if len(chosen):
+            np.maximum(max_similarity, (vectors @ vectors[chosen].T).max(axis=1), out=max_similarity)
+
+    while len(picked) < n:
+        fresh = np.flatnonzero(available & ~(has_text & (max_similarity >= DUPLICATE_SIMILARITY)))
+        if not len(fresh):
+            break
+        # Per section, the fresh candidate least similar to the picks so far.
+        order = fresh[np.lexsort((fresh, max_similarity[fresh], sections[fresh]))]
+        firsts = order[np.r_[True, sections[order][1:] != sections[order][:-1]]]
+        need = n - len(picked)
+        step = max(len(firsts) / need, 1)
+        take(firsts[(np.arange(min(need, len(firsts))) * step).astype(int)], DUPLICATE_SIMILARITY)
+
+    # Too few distinct candidates: fill up with the least similar remaining
+    # near-duplicates rather than leaving placeholder slides.
+    while len(picked) < n:
+        rest = np.flatnonzero(available & ~(has_text & (max_similarity >= EXACT_SIMILARITY)))
+        if not len(rest):
+            break
+        take(rest[np.argsort(max_similarity[rest], kind="stable")[:n - len(picked)]], EXACT_SIMILARITY)
+
+    # Slides follow the document: section order, then the model's order.
+    picked.sort(key=lambda index: (sections[index], index))
+    return [items[index] for index in picked]
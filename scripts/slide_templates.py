@@ -0,0 +1,177 @@
+# slide_templates.py
+import json
+import re
+import uuid
+
+# Templates are JSON trees with Field placeholders. Each tree is serialized
+# once when it is registered; rendering a slide only splices the JSON-encoded
+# per-item values between the precompiled constant fragments.
+class Field:
+    def __init__(self, name):
+        self.name = name
+
+def _mark(tree):
+    if isinstance(tree, Field):
+        return f"\0{tree.name}\0"
+    if isinstance(tree, dict):
+        return {key: _mark(value) for key, value in tree.items()}
+    if isinstance(tree, list):
+        return [_mark(value) for value in tree]
+    return tree
+
+_FIELD_RE = re.compile(r'"\\u0000(\w+)\\u0000"')
+
+class JSONTemplate:
+    def __init__(self, tree):
+        pieces = _FIELD_RE.split(json.dumps(_mark(tree)))
+        self.parts = pieces[0::2]
+        self.names = pieces[1::2]
+
+    def render_raw(self, raw_values):
+        out = [self.parts[0]]
+        for name, part in zip(self.names, self.parts[1:]):
+            out.append(raw_values[name])
+            out.append(part)
+        return "".join(out)
+
+    def render(self, values):
+        return self.render_raw({name: json.dumps(values[name]) for name in self.names})
+
+class SlideTemplate:
+    # library is the versioned H5P library string ("H5P.MultiChoice 1.14");
+    # fields(item, number) returns the per-slide values for the Field
+    # placeholders in slide, and placeholder(number) returns the item used
+    # when the LLM returned too few. ids names the subContentId fields, which
+    # are filled with content hashes so the same slide always renders to the
+    # same JSON. schema and slide_class are attached by schemas.register and
+    # ir.slide_type, so every per-type table hangs off this one registry.
+    def __init__(self, library, content_type, slide, fields, placeholder, ids=("subContentId",)):
+        self.library = library
+        self.machine_name, version = library.split(" ")
+        self.major_version, self.minor_version = version.split(".")
+        self.content_type = content_type
+        self.fields = fields
+        self.placeholder = placeholder
+        self.ids = ids
+        self.template = JSONTemplate(slide)
+        self.schema = None
+        self.slide_class = None
+
+    def render(self, item, number):
+        values = self.fields(item, number)
+        content = json.dumps(values, sort_keys=True)
+        for name in self.ids:
+            values[name] = _sub_content_id(self.library, number, name, content)
+        return self.template.render(values)
+
+TEMPLATES = {}
+CONTENT_TYPES = {}
+
+def register(template):
+    TEMPLATES[template.library] = template
+    CONTENT_TYPES[template.content_type] = template.library
+    return template
+
+def template_for(content_type):
+    return TEMPLATES[CONTENT_TYPES[content_type]]
+
+def true_false_value(value):
+    # Models answer True/False items with booleans or "true"/"false" strings;
+    # anything else gives None.
+    if isinstance(value, str):
+        value = {"true": True, "false": False}.get(value.strip().lower())
+    return value if isinstance(value, bool) else None
+
+def preloaded_dependencies():
+    return [
+        {"machineName": t.machine_name, "majorVersion": t.major_version, "minorVersion": t.minor_version}
+        for t in TEMPLATES.values()
+    ]
+
+def _sub_content_id(library, number, name, content):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"h5p:{library}:{number}:{name}:{content}"))
+
+def _action(library, params, sub_content_id="subContentId"):
+    return {"library": library, "params": params, "subContentId": Field(sub_content_id)}
+
+def _slide(elements, title="title"):
+    return {"elements": elements, "title": Field(title), "slideBackgroundSelector": {}}
+
+def _element(action, y=5, height=90):
+    return {"x": 5, "y": y, "width": 90, "height": height, "action": action}
+
+register(SlideTemplate(
+    "H5P.MultiChoice 1.14",
+    "Multiple Choice",
+    _slide([_element(_action("H5P.MultiChoice 1.14", {
+        "question": Field("question"),
+        "answers": Field("answers"),
+        "behaviour": {
+            "enableRetry": True,
+            "enableSolutionsButton": True,
+            "singlePoint": False,
+            "showSolutions": True
+        },
+        "l10n": {"showSolutions": "Show solutions", "retry": "Retry"}
+    }))]),
+    lambda item, number: {
+        "question": item["question"],
+        "answers": [{"text": opt, "correct": opt == item["correct"]} for opt in item["options"]],
+        "title": f"Question {number}"
+    },
+    lambda number: {"question": f"Question {number}", "options": ["A", "B", "C", "D"], "correct": "A"}
+))
+
+register(SlideTemplate(
+    "H5P.Blanks 1.12",
+    "Fill in the Blanks",
+    _slide([_element(_action("H5P.Blanks 1.12", {
+        "text": Field("text"),
+        "behaviour": {
+            "enableRetry": True,
+            "enableSolutionsButton": True,
+            "showSolutions": True
+        }
+    }))]),
+    lambda item, number: {
+        "text": item["text"].replace("____", f"*{item['answer']}*"),
+        "title": f"Sentence {number}"
+    },
+    lambda number: {"text": f"Sentence {number} ____.", "answer": "missing"}
+))
+
+register(SlideTemplate(
+    "H5P.TrueFalse 1.8",
+    "True/False",
+    _slide([_element(_action("H5P.TrueFalse 1.8", {
+        "question": Field("question"),
+        "correct": Field("correct"),
+        "behaviour": {
+            "enableRetry": True,
+            "enableSolutionsButton": True,
+            "showSolutions": True
+        }
+    }))]),
+    lambda item, number: {
+        "question": item["question"],
+        "correct": bool(true_false_value(item["correct"])),
+        "title": f"Statement {number}"
+    },
+    lambda number: {"question": f"Statement {number}", "correct": True}
+))
+
+register(SlideTemplate(
+    "H5P.AdvancedText 1.1",
+    "Text",
+    _slide([
+        _element(_action("H5P.AdvancedText 1.1", {"text": Field("outline")}, "outlineId"), y=5, height=40),
+        _element(_action("H5P.AdvancedText 1.1", {"text": Field("notes")}, "notesId"), y=50, height=40)
+    ]),
+    lambda item, number: {
+        "outline": f"<h3>{item.get('outline', item.get('text', f'Slide {number} Outline'))}</h3>",
+        "notes": f"<p><em>Speaker Notes:</em> {item.get('notes', 'No speaker notes provided.')}</p>",
+        "title": f"Slide {number}"
+    },
+    lambda number: {"outline": f"Slide {number} Outline", "notes": "No notes"},
+    ids=("outlineId", "notesId")
+))
@@ -0,0 +1,115 @@
+# tokens.py
+import itertools
+import math
+import re
+import threading
+
+from providers import CONTEXT_LIMITS, DEFAULT_CONTEXT_LIMIT, SAMPLING
+
+# Room left in the context window for the instructions wrapped around the
+# document text (leading prompt, JSON instructions, system prompt).
+PROMPT_OVERHEAD = 1000
+# Chunks stay well below the largest context windows so each prompt stays
+# focused on a few pages of the document.
+MAX_CHUNK_TOKENS = 12000
+
+# BPE vocabularies encode most common words as a single token and split long
+# words every few characters; each punctuation mark is usually its own token.
+_PIECE_RE = re.compile(r"\w{1,6}|[^\w\s]")
+
+class HeuristicCounter:
+    # Offline approximation used when no tokenizer is available. scale adjusts
+    # for vocabularies that split text finer (>1) or coarser (<1) than GPT.
+    name = "heuristic"
+
+    def __init__(self, scale=1.0):
+        self.scale = scale
+
+    def count(self, text):
+        return math.ceil(len(_PIECE_RE.findall(text)) * self.scale)
+
+    def truncate(self, text, max_tokens):
+        # Cuts after the last whole token that fits, in a single pass.
+        limit = int(max_tokens / self.scale)
+        if limit <= 0:
+            return ""
+        matches = list(itertools.islice(_PIECE_RE.finditer(text), limit, limit + 1))
+        if not matches:
+            return text
+        return text[:matches[0].start()].rstrip()
+
+class TiktokenCounter:
+    # Exact counts for OpenAI-compatible vocabularies. tiktoken is optional and
+    # loads its encoding files from a local cache when offline.
+    def __init__(self, encoding):
+        import tiktoken
+        self.name = encoding
+        self.encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text):
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text, max_tokens):
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max(max_tokens, 0)])
+
+# Provider name -> factory. Factories may raise (missing tokenizer package or
+# encoding files); the heuristic is used instead.
+COUNTERS = {
+    "OpenAI": lambda: TiktokenCounter("o200k_base"),
+    "Groq": lambda: HeuristicCounter(1.15),
+    "Claude": lambda: HeuristicCounter(1.1),
+    "Google Gemini": lambda: HeuristicCounter(1.0)
+}
+DEFAULT_COUNTER = HeuristicCounter()
+_counters = {}
+_lock = threading.Lock()
+
+def register_counter(provider_name, factory):
+    with _lock:
+        COUNTERS[provider_name] = factory
+        _counters.pop(provider_name, None)
+
+def _providers(provider):
+    # A FallbackProvider must fit every provider it may send the prompt to.
+    return getattr(provider, "providers", None) or [provider]
+
+def _counter_for_name(name):
+    with _lock:
+        counter = _counters.get(name)
+        if counter is None:
+            factory = COUNTERS.get(name)
+            try:
+                counter = factory() if factory else DEFAULT_COUNTER
+            except Exception:
+                counter = DEFAULT_COUNTER
+            _counters[name] = counter
+        return counter
+
+def counter_for(provider=None):
+    # Accepts a provider object or a provider name; None gives the heuristic.
+    if provider is None:
+        return DEFAULT_COUNTER
+    if isinstance(provider, str):
+        return _counter_for_name(provider)
+    counters = [_counter_for_name(p.name) for p in _providers(provider)]
+    # With several vocabularies, the one that counts the most tokens is the
+    # safe choice; heuristic scales give the ordering.
+    return max(counters, key=lambda c: getattr(c, "scale", 1.0))
+
+def context_limit(provider):
+    return min(CONTEXT_LIMITS.get(p.model, DEFAULT_CONTEXT_LIMIT) for p in _providers(provider))
+
+def chunk_budget(provider, max_chunk_tokens=MAX_CHUNK_TOKENS, sampling=SAMPLING):
+    # Document tokens per prompt: the model's context window minus the reply
+    # and the prompt instructions, capped at max_chunk_tokens.
+    available = context_limit(provider) - sampling["max_tokens"] - PROMPT_OVERHEAD
+    return max(min(available, max_chunk_tokens), 256)
+
+def count_tokens(text, counter=None):
+    return (counter or DEFAULT_COUNTER).count(text)
+
+def truncate_tokens(text, max_tokens, counter=None):
+    return (counter or DEFAULT_COUNTER).truncate(text, max_tokens)
@@ -0,0 +1,10 @@
+# conftest.py
+import os
+import sys
+
+# Stage timings are not logged to metrics.jsonl during tests.
+os.environ.setdefault("H5P_METRICS_LOG", "")
+
+# The app's modules live side by side in scripts/ and import each other by
+# name, so tests import them the same way.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
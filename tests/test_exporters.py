@@ -0,0 +1,81 @@
+# test_exporters.py
+import csv
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from exporters import export_bytes
+from ir import build_presentation
+from schemas import validate_item
+from slide_templates import CONTENT_TYPES, template_for
+
+QTI = "{http://www.imsglobal.org/xsd/imsqti_v2p1}"
+
+ITEMS = [
+    {"type": "Multiple Choice", "question": "What is 1 + 1 = {x}?", "options": ["1", "2 ~ two", "#3"], "correct": "2 ~ two"},
+    {"type": "Fill in the Blanks", "text": "Water <boils> at ____ & steams.", "answer": "100: degrees"},
+    {"type": "True/False", "question": "Ice is \"hot\"", "correct": "False"},
+    {"type": "Text", "outline": "Key point", "notes": "Notes\nover lines"}
+]
+
+def presentation(items=ITEMS):
+    return build_presentation("lecture", "Mixed", items)
+
+def test_every_content_type_is_fully_registered():
+    for content_type in CONTENT_TYPES:
+        template = template_for(content_type)
+        assert template.schema is not None and template.slide_class is not None
+        assert validate_item(template.placeholder(1), content_type)[1] == []
+
+def test_true_false_is_normalized_once():
+    slide = presentation().slides[2]
+    assert slide.correct is False
+    item, problems = validate_item({"question": "Q", "correct": " TRUE "}, "True/False")
+    assert problems == [] and item["correct"] is True
+
+def test_gift_escapes_special_characters():
+    lines = export_bytes(presentation(), "gift").decode("utf-8").split("\n\n")
+    assert lines[0] == r"::Question 1:: What is 1 + 1 \= \{x\}? {~1 =2 \~ two ~\#3}"
+    assert lines[1] == r"::Sentence 2:: Water <boils> at {=100\: degrees} & steams."
+    assert lines[2] == '::Statement 3:: Ice is "hot" {FALSE}'
+    assert lines[3] == "::Slide 4:: Key point"
+
+def test_moodle_xml_parses():
+    quiz = ET.fromstring(export_bytes(presentation(), "moodle_xml"))
+    questions = quiz.findall("question")
+    assert [q.get("type") for q in questions] == ["multichoice", "shortanswer", "truefalse", "description"]
+    choice = questions[0]
+    assert choice.find("questiontext/text").text == "What is 1 + 1 = {x}?"
+    assert [(a.get("fraction"), a.find("text").text) for a in choice.findall("answer")] == [("0", "1"), ("100", "2 ~ two"), ("0", "#3")]
+    assert questions[1].find("questiontext/text").text == "Water <boils> at ____ & steams."
+    assert [a.get("fraction") for a in questions[2].findall("answer")] == ["0", "100"]
+    assert questions[3].find("questiontext/text").text == "Key point\n\nNotes\nover lines"
+
+def test_qti_package_parses():
+    with zipfile.ZipFile(io.BytesIO(export_bytes(presentation(), "qti"))) as package:
+        manifest = ET.fromstring(package.read("imsmanifest.xml"))
+        hrefs = [r.get("href") for r in manifest.iter("{http://www.imsglobal.org/xsd/imscp_v1p1}resource")]
+        # Text slides have no interaction and are left out.
+        assert hrefs == ["items/item1.xml", "items/item2.xml", "items/item3.xml"]
+        items = [ET.fromstring(package.read(href)) for href in hrefs]
+    choice, blank, true_false = items
+    assert choice.find(f"{QTI}responseDeclaration/{QTI}correctResponse/{QTI}value").text == "C1"
+    assert [c.text for c in choice.iter(f"{QTI}simpleChoice")] == ["1", "2 ~ two", "#3"]
+    paragraph = blank.find(f"{QTI}itemBody/{QTI}p")
+    assert paragraph.text == "Water <boils> at " and paragraph.find(f"{QTI}textEntryInteraction").tail == " & steams."
+    assert blank.find(f"{QTI}responseDeclaration/{QTI}correctResponse/{QTI}value").text == "100: degrees"
+    assert true_false.find(f"{QTI}responseDeclaration/{QTI}correctResponse/{QTI}value").text == "C1"
+    assert true_false.get("title") == "Statement 3"
+
+@pytest.mark.parametrize("name", ["h5p", "markdown", "gift", "moodle_xml", "qti", "csv"])
+def test_exports_are_deterministic(name):
+    assert export_bytes(presentation(), name) == export_bytes(presentation(), name)
+
+def test_csv_rows():
+    rows = list(csv.reader(io.StringIO(export_bytes(presentation(), "csv").decode("utf-8"))))
+    assert rows[0] == ["number", "type", "question", "options", "answer", "notes"]
+    assert rows[1] == ["1", "Multiple Choice", "What is 1 + 1 = {x}?", "1 | 2 ~ two | #3", "2 ~ two", ""]
+    assert rows[3] == ["3", "True/False", 'Ice is "hot"', "True | False", "False", ""]
+    assert rows[4][5] == "Notes\nover lines"
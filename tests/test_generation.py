@@ -0,0 +1,69 @@
+# test_generation.py
+import asyncio
+import json
+
+import pytest
+
+from generation import agenerate_mixed
+from h5p_builder import render_content_json
+from ir import build_presentation
+from providers import run
+
+PAGES = [(i, f"Page {i} " + "word " * 2000) for i in range(6)]
+
+class Recorder:
+    # generate(text, content_type) that records calls and the peak number
+    # running at once; types listed in failing raise instead.
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = failing
+        self.active = self.peak = 0
+
+    async def __call__(self, text, content_type):
+        self.calls.append(content_type)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if content_type in self.failing:
+            raise ValueError(f"{content_type} failed")
+        return [{"question": f"{content_type} {text[:7]} #{i}", "type": "made up"} for i in range(3)]
+
+def mixed(generate, content_types, n, concurrency=2):
+    return run(agenerate_mixed(generate, PAGES, content_types, n=n, chunk_tokens=2500, concurrency=concurrency))
+
+def test_types_are_interleaved_and_tagged():
+    items, chunks, errors = mixed(Recorder(), ["Multiple Choice", "True/False"], 4)
+    assert [item["type"] for item in items] == ["Multiple Choice", "True/False"] * 2
+    assert errors == []
+    assert [c["first_page"] for c in chunks] == sorted(c["first_page"] for c in chunks)
+
+def test_single_type_items_are_tagged():
+    items, _, _ = mixed(Recorder(), ["Text"], 3)
+    assert {item["type"] for item in items} == {"Text"}
+
+def test_concurrency_is_shared_across_types():
+    generate = Recorder()
+    mixed(generate, ["Multiple Choice", "True/False", "Text"], 9, concurrency=2)
+    assert generate.peak == 2
+
+def test_types_without_a_share_are_not_generated():
+    generate = Recorder()
+    items, _, _ = mixed(generate, ["Multiple Choice", "True/False"], 1)
+    assert len(items) == 1
+    assert set(generate.calls) == {"Multiple Choice"}
+
+def test_a_failing_type_does_not_fail_the_others():
+    items, _, errors = mixed(Recorder(failing=["True/False"]), ["Multiple Choice", "True/False"], 4)
+    assert items and {item["type"] for item in items} == {"Multiple Choice"}
+    assert [str(e) for e in errors] == ["True/False failed"]
+
+def test_all_types_failing_raises():
+    with pytest.raises(ValueError):
+        mixed(Recorder(failing=["Multiple Choice", "True/False"]), ["Multiple Choice", "True/False"], 4)
+
+def test_mixed_presentation_is_padded_from_its_last_type():
+    items = [{"type": "Multiple Choice", "question": "Q?", "options": ["a", "b"], "correct": "a"}, {"type": "Text", "outline": "Point"}]
+    presentation = build_presentation("doc", "Mixed", items, slide_count=3)
+    assert [slide.content_type for slide in presentation.slides] == ["Multiple Choice", "Text", "Text"]
+    assert len(json.loads(render_content_json("Mixed", presentation.items()))["presentation"]["slides"]) == 3
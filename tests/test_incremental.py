@@ -0,0 +1,91 @@
+# test_incremental.py
+import io
+import json
+import zipfile
+
+import pytest
+
+from h5p_builder import build_h5p_package
+from incremental import _slide_entry, aregenerate_item, build_manifest, manifest_items, patch_package
+from providers import run
+
+def mc(question, pages):
+    return {"question": question, "options": ["a", "b", "c"], "correct": "b", "type": "Multiple Choice", "pages": pages}
+
+CHUNKS = [
+    {"first_page": 0, "last_page": 1, "text": "Cells have walls."},
+    {"first_page": 2, "last_page": 3, "text": "Leaves photosynthesise."},
+]
+
+@pytest.fixture
+def package():
+    items = [mc("What do cells have?", [0, 1]), mc("What do leaves do?", [2, 3]), mc("Where are walls?", [0, 1])]
+    manifest = build_manifest("bio", "Multiple Choice", items, CHUNKS, "lead")
+    data = io.BytesIO()
+    build_h5p_package("bio", "Multiple Choice", items, data)
+    return data.getvalue(), manifest
+
+def slides(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as package:
+        return json.loads(package.read("content/content.json"))["presentation"]["slides"]
+
+def patch(data, manifest):
+    target = io.BytesIO()
+    patch_package(io.BytesIO(data), target, manifest)
+    return target.getvalue()
+
+def test_builds_are_deterministic(package):
+    data, manifest = package
+    again = io.BytesIO()
+    build_h5p_package("bio", "Multiple Choice", manifest_items(manifest), again)
+    assert again.getvalue() == data
+
+def test_manifest_keeps_only_referenced_sources(package):
+    _, manifest = package
+    assert manifest["sources"] == {"0-1": "Cells have walls.", "2-3": "Leaves photosynthesise."}
+    assert [s["source"] for s in manifest["slides"]] == ["0-1", "2-3", "0-1"]
+
+def test_unchanged_manifest_round_trips(package):
+    data, manifest = package
+    assert patch(data, manifest) == data
+
+def test_patch_changes_only_the_replaced_slide(package):
+    data, manifest = package
+    manifest["slides"][1] = _slide_entry(2, "Multiple Choice", mc("Where does photosynthesis happen?", [2, 3]))
+    patched = patch(data, manifest)
+    before, after = slides(data), slides(patched)
+    assert [a == b for a, b in zip(before, after)] == [True, False, True]
+    assert "photosynthesis" in json.dumps(after[1])
+    with zipfile.ZipFile(io.BytesIO(data)) as old, zipfile.ZipFile(io.BytesIO(patched)) as new:
+        assert new.testzip() is None
+        assert [(i.filename, i.date_time) for i in new.infolist()] == [(i.filename, i.date_time) for i in old.infolist()]
+        assert new.read("h5p.json") == old.read("h5p.json")
+    rebuilt = io.BytesIO()
+    build_h5p_package("bio", "Multiple Choice", manifest_items(manifest), rebuilt)
+    assert slides(rebuilt.getvalue()) == after
+
+class OneItemProvider:
+    name = "Fake"
+    model = "fake"
+
+    def __init__(self):
+        self.prompts = []
+
+    async def stream(self, prompt, system=None, sampling=None):
+        self.prompts.append(prompt)
+        yield json.dumps([{"question": "What do leaves make?", "options": ["sugar", "salt"], "correct": "sugar"}])
+
+def test_regenerate_item_uses_the_slide_source(package):
+    _, manifest = package
+    provider = OneItemProvider()
+    item = run(aregenerate_item(manifest, 2, provider))
+    assert item["question"] == "What do leaves make?" and item["pages"] == [2, 3]
+    assert len(provider.prompts) == 1
+    assert "Leaves photosynthesise." in provider.prompts[0] and "What do leaves do?" in provider.prompts[0]
+    assert manifest["slides"][1]["item"] is item
+    assert [s["item"]["question"] for s in manifest["slides"]] == ["What do cells have?", "What do leaves make?", "Where are walls?"]
+
+def test_regenerate_item_checks_the_slide_number(package):
+    _, manifest = package
+    with pytest.raises(ValueError):
+        run(aregenerate_item(manifest, 4, OneItemProvider()))
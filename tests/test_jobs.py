@@ -0,0 +1,71 @@
+# test_jobs.py
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+import jobs
+from jobs import DONE, FAILED, QUEUED, RUNNING, JobStore
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+def add_job(store, job_id, status, owner):
+    store.create(job_id, {})
+    store._write("UPDATE jobs SET status = ?, owner = ? WHERE id = ?", (status, owner, job_id))
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def test_jobs_of_live_processes_are_kept(store):
+    other = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        add_job(store, "mine", RUNNING, os.getpid())
+        add_job(store, "other", QUEUED, other.pid)
+        store.recover()
+        assert store.get("mine")["status"] == RUNNING
+        assert store.get("other")["status"] == QUEUED
+    finally:
+        other.kill()
+        other.wait()
+
+def test_jobs_of_dead_processes_fail(store):
+    add_job(store, "dead", RUNNING, dead_pid())
+    add_job(store, "legacy", QUEUED, None)
+    store.recover()
+    for job_id in ("dead", "legacy"):
+        job = store.get(job_id)
+        assert job["status"] == FAILED
+        assert job["error"] == "Interrupted by a server restart"
+
+def test_finished_jobs_are_left_alone(store):
+    add_job(store, "done", DONE, dead_pid())
+    store.recover()
+    assert store.get("done")["status"] == DONE
+
+def test_old_jobs_are_pruned_with_their_data(store, monkeypatch):
+    add_job(store, "old", DONE, os.getpid())
+    store.add_event("old", 1.0, "Done")
+    store.put_artifact("old", "content.json", b"[]")
+    later = time.time() + jobs.MAX_AGE + 60
+    monkeypatch.setattr(jobs.time, "time", lambda: later)
+    add_job(store, "new", DONE, os.getpid())
+    store.recover()
+    assert store.get("old") is None
+    assert store.events("old") == [] and store.artifact("old", "content.json") is None
+    assert store.get("new") is not None
+
+def test_databases_without_owner_are_migrated(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT, params TEXT, progress REAL, message TEXT, error TEXT, created REAL, updated REAL)")
+        conn.execute("INSERT INTO jobs VALUES ('old', 'running', '{}', 0, '', NULL, ?, ?)", (time.time(), time.time()))
+    store = JobStore(path)
+    store.recover()
+    assert store.get("old")["status"] == FAILED
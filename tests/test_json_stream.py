@@ -0,0 +1,51 @@
+# test_json_stream.py
+import pytest
+
+from json_stream import JSONArrayItemParser, iter_json_items
+
+def feed_in_pieces(text, size):
+    parser = JSONArrayItemParser()
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return items, parser
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_items_are_returned_as_they_close(size):
+    items, parser = feed_in_pieces('[{"a": 1}, {"b": "x}]"}, {"c": [1, 2]}]', size)
+    assert items == [{"a": 1}, {"b": "x}]"}, {"c": [1, 2]}]
+    assert parser.finished and not parser.errors
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_preamble_with_brackets_is_skipped(size):
+    items, parser = feed_in_pieces('Note [1]: here you go\n[{"a": 1}]', size)
+    assert items == [{"a": 1}]
+    assert parser.finished
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_empty_array_in_preamble_is_skipped(size):
+    items, _ = feed_in_pieces('See [] and [ ] below.\n```json\n[\n  {"a": "[1]"}\n]\n```', size)
+    assert items == [{"a": "[1]"}]
+
+def test_escaped_quotes_inside_strings():
+    items, _ = feed_in_pieces(r'[{"q": "say \"}\" twice"}]', 1)
+    assert items == [{"q": 'say "}" twice'}]
+
+def test_invalid_object_is_recorded_and_others_kept():
+    items, parser = feed_in_pieces('[{"a": 1}, {oops}, {"b": 2}]', 4)
+    assert items == [{"a": 1}, {"b": 2}]
+    assert len(parser.errors) == 1
+    assert len(parser.new_errors()) == 1
+    assert parser.new_errors() == []
+
+def test_text_after_the_array_is_ignored():
+    parser = JSONArrayItemParser()
+    assert parser.feed('[{"a": 1}] and [{"b": 2}]') == [{"a": 1}]
+    assert parser.feed('[{"c": 3}]') == []
+
+def test_no_array():
+    items, parser = feed_in_pieces("I cannot help with that [citation needed].", 5)
+    assert items == [] and not parser.finished
+
+def test_iter_json_items():
+    assert list(iter_json_items(['Sure! [{"a"', ': 1}', "]"])) == [{"a": 1}]
@@ -0,0 +1,167 @@
+# test_providers.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import providers
+from llm import agenerate_questions
+from providers import FallbackProvider, OpenAIProvider, ProviderError, run
+
+class FakeAPI:
+    # A local HTTP server standing in for the providers. Each route (the
+    # first path segment, used as a provider's base URL) plays a script of
+    # (status, headers, body, delay) replies; the last one repeats.
+    def __init__(self):
+        self.scripts = {}
+        self.requests = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                route = self.path.strip("/").split("/")[0]
+                api.requests.append((route, self.path, body))
+                script = api.scripts[route]
+                status, headers, reply, delay = script.pop(0) if len(script) > 1 else script[0]
+                time.sleep(delay)
+                data = reply.encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def url(self, route):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/{route}"
+
+    def script(self, route, *replies):
+        self.scripts[route] = [reply + (0,) * (4 - len(reply)) for reply in replies]
+
+    def calls(self, route):
+        return [r for r in self.requests if r[0] == route]
+
+def completion(text):
+    return json.dumps({"choices": [{"message": {"content": text}}]})
+
+def events(*texts):
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': t}}]})}\n\n" for t in texts]
+    return "".join(lines) + "data: [DONE]\n\n"
+
+SSE = {"Content-Type": "text/event-stream"}
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setattr(providers, "BACKOFF_BASE", 0.01)
+    server = FakeAPI()
+    yield server
+    run(providers.aclose_clients())
+    server.server.shutdown()
+
+def provider(api, route, max_retries=2):
+    # A fresh key per provider keeps rate-limit buckets apart between tests.
+    return OpenAIProvider(f"key-{route}-{time.monotonic()}", base_url=api.url(route), max_retries=max_retries)
+
+def collect(stream):
+    async def go():
+        return [text async for text in stream]
+    return run(go())
+
+def test_complete_sends_model_and_prompt(api):
+    api.script("a", (200, {}, completion("hello")))
+    assert run(provider(api, "a").complete("the prompt")) == "hello"
+    route, path, body = api.calls("a")[0]
+    assert path == "/a/chat/completions"
+    assert body["model"] == "gpt-4o-mini"
+    assert body["messages"][-1] == {"role": "user", "content": "the prompt"}
+
+def test_server_errors_are_retried(api):
+    api.script("a", (503, {}, "busy"), (502, {}, "busy"), (200, {}, completion("ok")))
+    assert run(provider(api, "a").complete("p")) == "ok"
+    assert len(api.calls("a")) == 3
+
+def test_429_waits_for_retry_after(api):
+    api.script("a", (429, {"Retry-After": "0.3"}, "slow down"), (200, {}, completion("ok")))
+    start = time.monotonic()
+    assert run(provider(api, "a").complete("p")) == "ok"
+    assert time.monotonic() - start >= 0.3
+    assert len(api.calls("a")) == 2
+
+def test_retries_are_bounded(api):
+    api.script("a", (503, {}, "busy"))
+    with pytest.raises(ProviderError) as error:
+        run(provider(api, "a", max_retries=1).complete("p"))
+    assert error.value.status == 503 and error.value.retryable
+    assert len(api.calls("a")) == 2
+
+def test_client_errors_are_not_retried(api):
+    api.script("a", (401, {}, "bad key"))
+    with pytest.raises(ProviderError) as error:
+        run(provider(api, "a").complete("p"))
+    assert error.value.status == 401 and not error.value.retryable
+    assert len(api.calls("a")) == 1
+
+def test_stream_yields_deltas_after_retrying(api):
+    api.script("a", (503, {}, "busy"), (200, SSE, events("[{", '"a": 1}', "]")))
+    assert "".join(collect(provider(api, "a").stream("p"))) == '[{"a": 1}]'
+    assert api.calls("a")[-1][2]["stream"] is True
+
+def test_fallback_after_primary_fails(api):
+    api.script("a", (500, {}, "down"))
+    api.script("b", (200, {}, completion("from b")), (200, SSE, events("from ", "b")))
+    fallback = FallbackProvider([provider(api, "a", max_retries=0), provider(api, "b")])
+    assert run(fallback.complete("p")) == "from b"
+    assert collect(fallback.stream("p")) == ["from ", "b"]
+
+def test_no_fallback_while_primary_answers(api):
+    api.script("a", (200, SSE, events("from a"), 0.3))
+    api.script("b", (200, SSE, events("from b")))
+    fallback = FallbackProvider([provider(api, "a"), provider(api, "b")])
+    assert collect(fallback.stream("p")) == ["from a"]
+    assert api.calls("b") == []
+
+def test_stream_hedges_to_fallback(api):
+    api.script("a", (200, SSE, events("from a"), 1.0))
+    api.script("b", (200, SSE, events("from b")))
+    fallback = FallbackProvider([provider(api, "a"), provider(api, "b")], hedge_after=0.1)
+    start = time.monotonic()
+    assert collect(fallback.stream("p")) == ["from b"]
+    assert time.monotonic() - start < 0.9
+
+def test_all_providers_failing_raises(api):
+    api.script("a", (500, {}, "down"))
+    api.script("b", (400, {}, "bad"))
+    fallback = FallbackProvider([provider(api, "a", max_retries=0), provider(api, "b")])
+    with pytest.raises(ProviderError):
+        run(fallback.complete("p"))
+    with pytest.raises(ProviderError):
+        collect(fallback.stream("p"))
+
+def test_garbled_stream_event_is_a_provider_error(api):
+    api.script("a", (200, SSE, events("[{", '"a": 1}') + "data: {not json\n\n"))
+    received = []
+
+    async def go():
+        async for text in provider(api, "a").stream("p"):
+            received.append(text)
+
+    with pytest.raises(ProviderError) as error:
+        run(go())
+    assert error.value.retryable
+    assert received == ["[{", '"a": 1}']
+
+def test_items_before_a_garbled_event_are_kept(api):
+    api.script("a", (200, SSE, events('[{"question": "Q?", "correct": true},') + "data: {not json\n\n"))
+    items = run(agenerate_questions(provider(api, "a"), "text", "True/False", "lead", cache=None))
+    assert [item["question"] for item in items] == ["Q?"]
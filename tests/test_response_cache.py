@@ -0,0 +1,63 @@
+# test_response_cache.py
+import pytest
+
+import response_cache
+from response_cache import ResponseCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A manual clock, so LRU order and expiry do not depend on timing.
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ResponseCache(str(tmp_path / "cache.db"), max_entries=3, ttl=60)
+
+def test_key_depends_on_every_part():
+    key = ResponseCache.key("OpenAI", "gpt-4o-mini", "prompt", {"temperature": 0.7})
+    assert key == ResponseCache.key("OpenAI", "gpt-4o-mini", "prompt", {"temperature": 0.7})
+    assert key != ResponseCache.key("Groq", "gpt-4o-mini", "prompt", {"temperature": 0.7})
+    assert key != ResponseCache.key("OpenAI", "gpt-4o", "prompt", {"temperature": 0.7})
+    assert key != ResponseCache.key("OpenAI", "gpt-4o-mini", "prompt!", {"temperature": 0.7})
+    assert key != ResponseCache.key("OpenAI", "gpt-4o-mini", "prompt", {"temperature": 0.2})
+
+def test_hits_and_misses(cache):
+    assert cache.get("a") is None
+    cache.put("a", "reply")
+    assert cache.get("a") == "reply"
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+def test_least_recently_used_entry_is_evicted(cache, clock):
+    for key in "abc":
+        clock[0] += 1
+        cache.put(key, key.upper())
+    clock[0] += 1
+    assert cache.get("a") == "A"
+    clock[0] += 1
+    cache.put("d", "D")
+    assert cache.stats()["entries"] == 3
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["A", "C", "D"]
+
+def test_entries_expire_after_ttl(cache, clock):
+    cache.put("a", "reply")
+    clock[0] += 59
+    assert cache.get("a") == "reply"
+    # Reading does not extend the lifetime; expiry counts from creation.
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+def test_put_replaces_and_renews(cache, clock):
+    cache.put("a", "old")
+    clock[0] += 50
+    cache.put("a", "new")
+    clock[0] += 50
+    assert cache.get("a") == "new"
+
+def test_clear(cache):
+    cache.put("a", "reply")
+    cache.clear()
+    assert cache.get("a") is None
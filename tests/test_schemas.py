@@ -0,0 +1,99 @@
+# test_schemas.py
+import json
+
+import pytest
+
+from llm import agenerate_questions
+from providers import run
+from schemas import build_repair_prompt, validate_item
+
+def test_multiple_choice_letter_answer_becomes_option_text():
+    item, problems = validate_item({"question": " Q? ", "options": ["red", "green", 3], "correct": "b"}, "Multiple Choice")
+    assert problems == []
+    assert item == {"question": "Q?", "options": ["red", "green", "3"], "correct": "green", "type": "Multiple Choice"}
+
+def test_multiple_choice_index_answer():
+    item, problems = validate_item({"question": "Q?", "options": ["red", "green"], "correct": 0}, "Multiple Choice")
+    assert problems == [] and item["correct"] == "red"
+
+@pytest.mark.parametrize("item", [
+    {"question": "Q?", "options": ["red", "green"], "correct": "blue"},
+    {"question": "Q?", "options": ["red"], "correct": "red"},
+    {"question": "", "options": ["red", "green"], "correct": "red"},
+    ["not", "an", "object"],
+])
+def test_multiple_choice_problems(item):
+    _, problems = validate_item(item, "Multiple Choice")
+    assert problems
+
+def test_fill_in_the_blanks_answer_is_blanked_locally():
+    item, problems = validate_item({"text": "Water boils at 100 degrees.", "answer": "100"}, "Fill in the Blanks")
+    assert problems == [] and item["text"] == "Water boils at ____ degrees."
+    _, problems = validate_item({"text": "Water boils.", "answer": "100"}, "Fill in the Blanks")
+    assert problems
+
+@pytest.mark.parametrize("blank", ["___", "_____", "__________"])
+def test_fill_in_the_blanks_blank_length_is_normalized(blank):
+    item, problems = validate_item({"text": f"The {blank} is blue.", "answer": "sky"}, "Fill in the Blanks")
+    assert problems == [] and item["text"] == "The ____ is blue."
+
+def test_true_false_strings():
+    item, problems = validate_item({"question": "Q", "correct": " False "}, "True/False")
+    assert problems == [] and item["correct"] is False
+    _, problems = validate_item({"question": "Q", "correct": "A"}, "True/False")
+    assert problems
+
+def test_text_defaults():
+    item, problems = validate_item({"text": "Key point"}, "Text")
+    assert problems == []
+    assert item["outline"] == "Key point" and item["notes"] == "No speaker notes provided."
+
+def test_model_type_is_overridden():
+    item, _ = validate_item({"question": "Q", "correct": True, "type": "tf"}, "True/False")
+    assert item["type"] == "True/False"
+
+def test_repair_prompt_lists_only_invalid_items():
+    prompt = build_repair_prompt("True/False", [({"question": "Q"}, ["'correct' must be true or false"]), ("{oops", ["not valid JSON"])])
+    assert "exactly 2 objects" in prompt
+    assert '1. {"question": "Q"}' in prompt and "2. {oops" in prompt
+
+class ScriptedProvider:
+    # Streams one reply and answers repair requests from a list.
+    name = "Fake"
+    model = "fake"
+
+    def __init__(self, reply, repairs):
+        self.reply = reply
+        self.repairs = list(repairs)
+        self.repair_prompts = []
+
+    async def stream(self, prompt, system=None, sampling=None):
+        yield self.reply
+
+    async def complete(self, prompt, system=None, sampling=None):
+        self.repair_prompts.append(prompt)
+        return self.repairs.pop(0)
+
+def test_only_invalid_items_are_sent_for_repair():
+    reply = json.dumps([
+        {"question": "Good?", "correct": True},
+        {"question": "Bad?", "correct": "maybe"},
+    ])
+    provider = ScriptedProvider(reply, [json.dumps([{"question": "Bad?", "correct": False}])])
+    items = run(agenerate_questions(provider, "text", "True/False", "lead", cache=None))
+    assert [(i["question"], i["correct"]) for i in items] == [("Good?", True), ("Bad?", False)]
+    assert len(provider.repair_prompts) == 1
+    assert "Bad?" in provider.repair_prompts[0] and "Good?" not in provider.repair_prompts[0]
+
+def test_repair_gives_up_after_bounded_rounds():
+    reply = json.dumps([{"question": "Good?", "correct": True}, {"question": "Bad?", "correct": "maybe"}])
+    still_bad = json.dumps([{"question": "Bad?", "correct": "maybe"}])
+    provider = ScriptedProvider(reply, [still_bad] * 5)
+    items = run(agenerate_questions(provider, "text", "True/False", "lead", cache=None))
+    assert [i["question"] for i in items] == ["Good?"]
+    assert len(provider.repair_prompts) == 2
+
+def test_preamble_with_brackets_still_yields_items():
+    provider = ScriptedProvider('Note [1]: here you go\n[{"question": "Q?", "correct": true}]', [])
+    items = run(agenerate_questions(provider, "text", "True/False", "lead", cache=None))
+    assert [i["question"] for i in items] == ["Q?"]
@@ -0,0 +1,40 @@
+# test_selection.py
+from selection import item_key, select_items, vectorize
+
+def mc(question):
+    return {"question": question, "options": ["a", "b"], "correct": "a"}
+
+def test_item_key_normalizes_text():
+    assert item_key(mc("What is  the CELL wall?")) == "what is the cell wall"
+    assert item_key({"outline": "Key point"}) == "key point"
+
+def test_vectors_are_normalized():
+    vectors = vectorize(["the cell wall", "the cell wall", "photosynthesis in leaves"])
+    assert abs(float(vectors[0] @ vectors[0]) - 1) < 1e-5
+    assert float(vectors[0] @ vectors[1]) > 0.99
+    assert float(vectors[0] @ vectors[2]) < 0.5
+
+def test_near_duplicates_are_dropped():
+    chunk = [mc("What does the cell wall do?"), mc("What does the cell wall do ?"), mc("Where does photosynthesis happen?")]
+    picked = select_items([chunk], 2)
+    assert [i["question"] for i in picked] == ["What does the cell wall do?", "Where does photosynthesis happen?"]
+
+def test_every_section_is_covered():
+    chunks = [[mc(f"Section {s} question about topic {s * 10 + i} number {i}") for i in range(10)] for s in range(5)]
+    picked = select_items(chunks, 5)
+    sections = [int(i["question"].split()[1]) for i in picked]
+    assert sections == [0, 1, 2, 3, 4]
+
+def test_short_selection_is_filled_but_never_with_exact_repeats():
+    chunk = [mc("Same question"), mc("Same question"), mc("Same question!"), mc("Another question entirely")]
+    picked = select_items([chunk], 4)
+    assert len(picked) == 2
+
+def test_output_follows_document_order():
+    chunks = [[mc("alpha beta gamma")], [], [mc("delta epsilon zeta"), mc("eta theta iota")]]
+    picked = select_items(chunks, 3)
+    assert [i["question"] for i in picked] == ["alpha beta gamma", "delta epsilon zeta", "eta theta iota"]
+
+def test_failed_chunks_and_bad_items_are_ignored():
+    assert select_items([None, ["not a dict"], [mc("q")]], 3) == [mc("q")]
+    assert select_items([], 3) == []
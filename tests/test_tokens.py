@@ -0,0 +1,68 @@
+# test_tokens.py
+import io
+
+from benchmark import make_pdf
+from generation import _split_oversized, chunk_pages
+from pdf_extract import iter_pages
+from tokens import HeuristicCounter
+
+COUNTER = HeuristicCounter()
+
+class CountingCounter(HeuristicCounter):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def count(self, text):
+        self.calls += 1
+        return super().count(text)
+
+def words(n, start=0):
+    return " ".join(f"w{i}" for i in range(start, start + n))
+
+def test_truncate_cuts_at_whole_tokens():
+    assert COUNTER.truncate("alpha beta, gamma", 3) == "alpha beta,"
+    assert COUNTER.truncate("alpha beta", 5) == "alpha beta"
+    assert COUNTER.truncate("alpha beta", 0) == ""
+    # Words longer than six characters count as several tokens.
+    assert COUNTER.truncate("abcdefghijkl mn", 1) == "abcdef"
+
+def test_truncate_honours_scale():
+    counter = HeuristicCounter(2.0)
+    assert counter.count("a b c") == 6
+    assert counter.truncate("a b c d", 4) == "a b"
+
+def test_split_oversized_keeps_lines_together():
+    text = "\n".join(words(4, i * 4) for i in range(6))
+    parts = _split_oversized(text, 8, COUNTER)
+    assert parts == ["\n".join(words(4, i * 4) for i in (j, j + 1)) for j in (0, 2, 4)]
+    assert all(COUNTER.count(part) <= 8 for part in parts)
+
+def test_split_oversized_cuts_long_lines():
+    parts = _split_oversized(words(25), 10, COUNTER)
+    assert [COUNTER.count(part) for part in parts] == [10, 10, 5]
+    assert " ".join(parts) == words(25)
+
+def test_chunk_pages_packs_whole_pages():
+    pages = [(i, words(30, i * 30)) for i in range(5)]
+    chunks = chunk_pages(pages, 70, COUNTER)
+    assert [(c["first_page"], c["last_page"]) for c in chunks] == [(0, 1), (2, 3), (4, 4)]
+    assert chunks[0]["text"] == pages[0][1] + "\n" + pages[1][1]
+
+def test_chunk_pages_splits_oversized_page():
+    pages = [(0, words(10)), (1, words(50, 10)), (2, words(5, 60))]
+    chunks = chunk_pages(pages, 20, COUNTER)
+    assert all(COUNTER.count(c["text"]) <= 20 for c in chunks)
+    assert [(c["first_page"], c["last_page"]) for c in chunks] == [(0, 0), (1, 1), (1, 1), (1, 2)]
+    assert " ".join(c["text"].replace("\n", " ") for c in chunks) == words(65)
+
+def test_chunk_pages_drops_blank_chunks():
+    assert chunk_pages([(0, "  "), (1, "\n")], 20, COUNTER) == []
+
+def test_iter_pages_counts_only_with_a_budget():
+    pdf = make_pdf(3)
+    counter = CountingCounter()
+    assert len(list(iter_pages(io.BytesIO(pdf), workers=1, counter=counter))) == 3
+    assert counter.calls == 0
+    assert [p for p, _ in iter_pages(io.BytesIO(pdf), max_tokens=1, workers=1, counter=counter)] == [0]
+    assert counter.calls == 1